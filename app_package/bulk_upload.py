@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import zipfile
+from datetime import date, datetime, timedelta
+from app_package import db, storage
+from app_package.identity import active_vehicles
+from app_package.models import Document, BulkOcrJob
+
+BULK_EXTENSIONS = {"pdf", "jpg", "jpeg", "png"}
+TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+STAGING_MAX_AGE = 24 * 3600  # seconds before an unconfirmed batch is cleaned up
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def normalize_registration(value):
+    """Uppercase alphanumerics only, so 'ka-01 ab 1234' matches 'KA01AB1234'."""
+    return re.sub(r"[^A-Z0-9]", "", (value or "").upper())
+
+
+def match_vehicle(text, vehicles_by_reg):
+    """Return the id of the vehicle whose registration appears in ``text``, longest match first."""
+    haystack = normalize_registration(text)
+    for reg in sorted(vehicles_by_reg, key=len, reverse=True):
+        if reg and reg in haystack:
+            return vehicles_by_reg[reg]
+    return None
+
+
+def vehicles_by_registration(user_id):
+    """``{normalized registration: vehicle id}`` for the user's active vehicles."""
+    return {normalize_registration(v["registration_number"]): v["id"] for v in active_vehicles(user_id)}
+
+
+def staging_dir(upload_folder, token):
+    if not TOKEN_RE.match(token or ""):
+        raise ArchiveError("Invalid upload batch.")
+    return os.path.join(upload_folder, "bulk", token)
+
+
+def cleanup_stale_batches(upload_folder):
+    root = os.path.join(upload_folder, "bulk")
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - STAGING_MAX_AGE
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+    # Committed by the caller along with the new batch's jobs
+    db.session.execute(
+        db.delete(BulkOcrJob).where(BulkOcrJob.created_at < datetime.utcnow() - timedelta(seconds=STAGING_MAX_AGE))
+    )
+
+
+def stage_archive(archive, upload_folder, max_files, max_entry_bytes):
+    """Stream each accepted ZIP member to its own file in a new staging directory.
+
+    Members are copied in chunks, one at a time, so the archive is never
+    extracted into memory. Returns ``(token, entries, skipped)``.
+    """
+    token = uuid.uuid4().hex
+    target = staging_dir(upload_folder, token)
+    os.makedirs(target)
+
+    entries, skipped = [], []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                original = os.path.basename(info.filename)
+                ext = original.rsplit(".", 1)[1].lower() if "." in original else ""
+                if original.startswith(".") or ext not in BULK_EXTENSIONS:
+                    skipped.append((info.filename, "unsupported file type"))
+                    continue
+                if info.file_size > max_entry_bytes:
+                    skipped.append((info.filename, "file too large"))
+                    continue
+                if len(entries) >= max_files:
+                    skipped.append((info.filename, f"more than {max_files} files"))
+                    continue
+
+                staged = f"{uuid.uuid4().hex}.{ext}"
+                written = 0
+                with zf.open(info) as src, open(os.path.join(target, staged), "wb") as dst:
+                    # Trust the bytes, not the header: stop runaway (zip bomb) members
+                    for chunk in iter(lambda: src.read(64 * 1024), b""):
+                        written += len(chunk)
+                        if written > max_entry_bytes:
+                            break
+                        dst.write(chunk)
+                if written > max_entry_bytes:
+                    os.remove(os.path.join(target, staged))
+                    skipped.append((info.filename, "file too large"))
+                    continue
+
+                entries.append({
+                    "staged": staged,
+                    "original": original,
+                    "file_type": "jpg" if ext == "jpeg" else ext,
+                })
+    except zipfile.BadZipFile:
+        shutil.rmtree(target, ignore_errors=True)
+        raise ArchiveError("The file is not a valid ZIP archive.")
+
+    return token, entries, skipped
+
+
+def match_filenames(entries, vehicles_by_reg):
+    """Propose a vehicle for each entry whose file name contains its registration."""
+    for entry in entries:
+        vehicle_id = match_vehicle(entry["original"].rsplit(".", 1)[0], vehicles_by_reg)
+        entry["vehicle_id"] = vehicle_id
+        entry["match"] = "filename" if vehicle_id else None
+        entry["ocr_date"] = None
+    return entries
+
+
+def enqueue_bulk_ocr(user_id, token, entries):
+    """Queue OCR of every staged entry for the OCR worker. The caller commits."""
+    jobs = [
+        BulkOcrJob(user_id=user_id, token=token, entry=i, status="pending",
+                   staged_path=f"bulk/{token}/{entry['staged']}")
+        for i, entry in enumerate(entries)
+    ]
+    db.session.add_all(jobs)
+    return jobs
+
+
+def complete_bulk_job(job, ocr_date, ocr_text):
+    """Record a finished OCR run's expiry and, from the scanned text, vehicle proposals."""
+    job.ocr_date = ocr_date
+    job.vehicle_id = match_vehicle(ocr_text, vehicles_by_registration(job.user_id)) if ocr_text else None
+    job.status = "done"
+    job.error = None
+    job.finished_at = datetime.utcnow()
+
+
+def bulk_progress(token):
+    """``{"status": "scanning" or "done", "processed": n, "total": n}`` for a batch.
+
+    A job that failed and is waiting for a retry counts as processed, so files
+    whose OCR keeps failing do not hold the batch in "scanning".
+    """
+    processed_expr = db.or_(BulkOcrJob.status.in_(("done", "failed")), BulkOcrJob.error.isnot(None))
+    total, processed = db.session.execute(
+        db.select(db.func.count(), db.func.count().filter(processed_expr)).where(BulkOcrJob.token == token)
+    ).one()
+    return {"status": "scanning" if processed < total else "done", "processed": processed, "total": total}
+
+
+def apply_bulk_results(manifest, token):
+    """Fill the manifest's entries with the OCR proposals found so far."""
+    entries = manifest["entries"]
+    jobs = db.session.execute(
+        db.select(BulkOcrJob.entry, BulkOcrJob.ocr_date, BulkOcrJob.vehicle_id)
+        .where(BulkOcrJob.token == token, BulkOcrJob.status == "done")
+    ).all()
+    for index, ocr_date, vehicle_id in jobs:
+        if index >= len(entries):
+            continue
+        entry = entries[index]
+        entry["ocr_date"] = ocr_date.isoformat() if ocr_date else None
+        if not entry["vehicle_id"] and vehicle_id:
+            entry["vehicle_id"] = vehicle_id
+            entry["match"] = "ocr"
+    return manifest
+
+
+def cancel_bulk_jobs(token):
+    """Stop queued OCR for a confirmed or discarded batch. The caller commits.
+
+    Rows are left for ``cleanup_stale_batches``, so a worker finishing one of
+    the batch's files still has its row to write to.
+    """
+    db.session.execute(
+        db.update(BulkOcrJob)
+        .where(BulkOcrJob.token == token, BulkOcrJob.status == "pending")
+        .values(status="failed", error="Batch closed", finished_at=datetime.utcnow())
+    )
+
+
+def write_manifest(target, manifest):
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+
+def read_manifest(upload_folder, token, user_id):
+    target = staging_dir(upload_folder, token)
+    try:
+        with open(os.path.join(target, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        raise ArchiveError("Upload batch not found or already processed.")
+    if manifest.get("user_id") != user_id:
+        raise ArchiveError("Upload batch not found or already processed.")
+    return target, manifest
+
+
+def new_manifest(user_id, doc_type, entries, skipped):
+    return {
+        "user_id": user_id,
+        "doc_type": doc_type,
+        "created_at": datetime.utcnow().isoformat(),
+        "entries": entries,
+        "skipped": skipped,
+    }
+
+
+def parse_iso_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def create_documents(target, upload_folder, rows):
+    """Store the confirmed staged files and add their documents in one commit.
+
+    ``rows`` are ``(entry, vehicle_id, doc_type, expiry_date)`` tuples. The
+    staging directory is removed only after the commit, so a failed batch
+    can be retried.
+    """
+    documents = []
+    for entry, vehicle_id, doc_type, expiry_date in rows:
+        ext = entry["staged"].rsplit(".", 1)[1]
+        ocr_date = parse_iso_date(entry.get("ocr_date"))
+        documents.append(Document(
+            vehicle_id=vehicle_id,
+            doc_type=doc_type,
+            expiry_date=expiry_date,
+            file_path=storage.store_file(os.path.join(target, entry["staged"]), ext, upload_folder),
+            file_type=entry["file_type"],
+            ocr_extracted_date=ocr_date.strftime("%d/%m/%Y") if ocr_date else None,
+            notes=f"Bulk upload: {entry['original']}",
+        ))
+    db.session.add_all(documents)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    shutil.rmtree(target, ignore_errors=True)
+    return documents
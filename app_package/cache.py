@@ -0,0 +1,194 @@
+"""Per-user cache for page data that is expensive to build but rarely changes.
+
+The default backend is an in-process LRU with per-entry expiry. It suits a
+single worker: invalidation only reaches the process that made the change,
+so other workers serve stale entries until their TTL ends (hence the short
+default TTLs without a shared backend). Production deployments with several
+workers set ``CACHE_URL`` to a ``redis://`` URL to share entries, and their
+invalidation, between workers. A failing backend counts as a miss, so a
+cache outage slows pages down but never breaks them.
+
+Misses are computed from the primary database, never the read replica: the
+commit that invalidated an entry may not have replicated yet, and an entry
+filled from a lagging replica would keep serving the old data for its TTL.
+
+Entries for a user are dropped after any commit that changes their account,
+or creates, edits or deletes one of their vehicles or documents through the
+ORM session. Bulk Core statements skip the session events; code that
+changes user data that way calls ``invalidate_on_commit`` itself.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from sqlalchemy import event
+from sqlalchemy.orm.util import identity_key
+from app_package import db, metrics
+from app_package.models import User, Vehicle, Document
+from app_package.replica import primary_reads
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+_cache = None
+
+
+class LocalCache:
+    """Thread-safe LRU dict; values are shared, so callers must not mutate them."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Shared backend; values are pickled, so they may only hold plain data."""
+
+    def __init__(self, url, prefix="vehicle-tracker:"):
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key):
+        try:
+            raw = self._client.get(self.prefix + key)
+        except redis.RedisError as e:
+            print(f"[Cache] Read of {key} failed: {e}")
+            return None
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self._client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
+        except redis.RedisError as e:
+            print(f"[Cache] Write of {key} failed: {e}")
+
+    def delete(self, *keys):
+        try:
+            self._client.delete(*(self.prefix + key for key in keys))
+        except redis.RedisError as e:
+            print(f"[Cache] Delete of {', '.join(keys)} failed: {e}")
+
+
+def configure_cache(url, max_entries):
+    """Select the backend: Redis for a ``redis://`` URL, the in-process LRU otherwise."""
+    global _cache
+    if url and not REDIS_AVAILABLE:
+        print("[Cache] CACHE_URL is set but the redis package is not installed; using the in-process cache")
+    _cache = RedisCache(url) if url and REDIS_AVAILABLE else LocalCache(max_entries)
+
+
+def get_cache():
+    return _cache
+
+
+def cached(name, key, ttl, compute):
+    """Return the cached value for ``key``, computing and storing it on a miss."""
+    if _cache is None or ttl <= 0:
+        return compute()
+    value = _cache.get(key)
+    if value is not None:
+        metrics.CACHE_REQUESTS.inc(cache=name, result="hit")
+        return value
+    metrics.CACHE_REQUESTS.inc(cache=name, result="miss")
+    with primary_reads():
+        value = compute()
+    if value is not None:
+        _cache.set(key, value, ttl)
+    return value
+
+
+def dashboard_key(user_id, day):
+    # Dated, because days remaining and urgency change at midnight
+    return f"dashboard:{user_id}:{day.isoformat()}"
+
+
+def session_user_key(user_id):
+    return f"identity:{user_id}"
+
+
+def user_keys(user_id):
+    """Every cache key holding data derived from ``user_id``'s account or fleet."""
+    return [dashboard_key(user_id, date.today()), session_user_key(user_id)]
+
+
+def invalidate_user(user_id):
+    if _cache is not None:
+        _cache.delete(*user_keys(user_id))
+
+
+def invalidate_on_commit(session, user_id):
+    """Drop ``user_id``'s cached data once ``session`` commits."""
+    session.info.setdefault("cache_invalidate_users", set()).add(user_id)
+
+
+def _history_values(obj, attr):
+    history = db.inspect(obj).attrs[attr].history
+    return [value for value in (*history.unchanged, *history.added, *history.deleted) if value is not None]
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changed_owners(session, flush_context):
+    user_ids, vehicle_ids = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Vehicle):
+            # Both the old and new owner when a vehicle changes hands
+            user_ids.update(_history_values(obj, "user_id"))
+        elif isinstance(obj, Document):
+            vehicle_ids.update(_history_values(obj, "vehicle_id"))
+
+    missing = set()
+    for vehicle_id in vehicle_ids:
+        vehicle = session.identity_map.get(identity_key(Vehicle, vehicle_id))
+        if vehicle is not None and vehicle.user_id is not None:
+            user_ids.add(vehicle.user_id)
+        else:
+            missing.add(vehicle_id)
+    if missing:
+        with session.no_autoflush:
+            user_ids.update(session.execute(
+                db.select(Vehicle.user_id).where(Vehicle.id.in_(missing))
+            ).scalars())
+
+    for user_id in user_ids:
+        invalidate_on_commit(session, user_id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_committed(session):
+    for user_id in session.info.pop("cache_invalidate_users", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop("cache_invalidate_users", None)
@@ -0,0 +1,176 @@
+import os
+import click
+from flask import current_app
+from app_package import db
+
+
+def register_commands(app):
+    """Attach the project's ``flask <command>`` CLI commands to ``app``."""
+
+    @app.cli.command("ocr-worker")
+    @click.option("--processes", type=int, default=None, help="OCR worker processes (default: OCR_WORKER_PROCESSES).")
+    @click.option("--poll-interval", type=float, default=5.0, show_default=True, help="Seconds to sleep when the queue is empty.")
+    @click.option("--once", is_flag=True, help="Drain the queue once and exit.")
+    def ocr_worker(processes, poll_interval, once):
+        """Run OCR jobs queued by document uploads."""
+        from app_package.ocr_queue import drain_ocr_queue, run_worker
+
+        app = current_app._get_current_object()
+        processes = processes or app.config["OCR_WORKER_PROCESSES"]
+        if once:
+            click.echo(f"Processed {drain_ocr_queue(app)} OCR jobs")
+        else:
+            run_worker(app, processes, poll_interval)
+
+    @app.cli.command("ocr-cache")
+    @click.option("--clear", is_flag=True, help="Drop all cached OCR results and counters.")
+    def ocr_cache(clear):
+        """Show OCR cache hit/miss counters."""
+        from app_package.ocr_utils import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            click.echo("OCR cache is disabled (OCR_CACHE_PATH is empty).")
+            return
+        if clear:
+            cache.clear()
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+        click.echo(
+            f"entries={stats['entries']}/{stats['max_entries']} hits={stats['hits']} "
+            f"misses={stats['misses']} evictions={stats['evictions']} hit_rate={hit_rate:.1f}%"
+        )
+
+    @app.cli.command("db-upgrade")
+    @click.option("--target", type=int, default=None, help="Stop at this schema version.")
+    def db_upgrade(target):
+        """Apply pending schema migrations."""
+        from app_package.migrations import create_and_upgrade, current_version
+
+        # New tables first; workers started with FAST_STARTUP never run create_all
+        applied = create_and_upgrade(db.engine, db.create_all, target=target)
+        with db.engine.connect() as conn:
+            version = current_version(conn)
+        click.echo(f"Schema at version {version} ({len(applied)} migrations applied)")
+
+    @app.cli.command("db-explain")
+    @click.option("--verbose", is_flag=True, help="Print the full plan of every query.")
+    def db_explain(verbose):
+        """Check that the hot queries use their indexes."""
+        from app_package.query_plans import check_query_plans
+
+        failures = 0
+        for name, index_name, ok, plan in check_query_plans(db.engine):
+            failures += not ok
+            click.echo(f"[{'ok' if ok else 'MISSING'}] {name}: {index_name}")
+            if verbose or not ok:
+                for line in plan:
+                    click.echo(f"      {line}")
+        if failures:
+            raise SystemExit(1)
+
+    @app.cli.command("import-fleet")
+    @click.argument("csv_file", type=click.File("r", encoding="utf-8-sig", errors="replace"))
+    @click.option("--email", required=True, help="Account that will own the imported vehicles.")
+    @click.option("--batch-size", type=int, default=1000, show_default=True)
+    def import_fleet(csv_file, email, batch_size):
+        """Bulk import vehicles and document expiry dates from a CSV file."""
+        from app_package.fleet_import import import_fleet_csv
+        from app_package.models import User
+
+        user = db.session.query(User).filter_by(email=email.strip().lower()).first()
+        if not user:
+            raise click.ClickException(f"No user with email {email}")
+
+        report = import_fleet_csv(csv_file, user.id, batch_size=batch_size)
+        click.echo(
+            f"{report['rows']} rows: {report['vehicles_created']} vehicles created, "
+            f"{report['vehicles_updated']} updated; {report['documents_created']} documents created, "
+            f"{report['documents_updated']} updated; {report['error_count']} errors"
+        )
+        for line, message in report["errors"]:
+            click.echo(f"  line {line}: {message}" if line else f"  {message}", err=True)
+
+    @app.cli.command("send-outbox")
+    @click.option("--batch-size", type=int, default=None, help="Messages per SMTP connection (default: OUTBOX_BATCH_SIZE).")
+    @click.option("--rate", type=float, default=None, help="Messages per second, 0 for unlimited (default: OUTBOX_RATE_LIMIT).")
+    def send_outbox(batch_size, rate):
+        """Deliver queued emails and show the outbox status."""
+        from app_package.mailer import deliver_outbox, outbox_counts
+
+        stats = deliver_outbox(current_app._get_current_object(), batch_size=batch_size, rate=rate)
+        rate_achieved = stats["sent"] / stats["seconds"] if stats["seconds"] else 0.0
+        click.echo(f"Sent {stats['sent']}, failed {stats['failed']} in {stats['batches']} batches "
+                   f"({rate_achieved:.1f} msg/s)")
+        counts = outbox_counts()
+        click.echo(" ".join(f"{status}={counts.get(status, 0)}" for status in ("pending", "sent", "failed")))
+
+    @app.cli.command("migrate-uploads")
+    @click.option("--batch-size", type=int, default=200, show_default=True)
+    def migrate_uploads(batch_size):
+        """Move flat uploads into deduplicated, hash-sharded storage."""
+        from app_package.storage import migrate_flat_uploads
+
+        report = migrate_flat_uploads(current_app.config["UPLOAD_FOLDER"], batch_size=batch_size)
+        click.echo(
+            f"{report['documents']} documents migrated: {report['blobs_created']} files stored, "
+            f"{report['deduplicated']} deduplicated; {report['missing']} missing on disk"
+        )
+
+    @app.cli.command("thumbnail-cache")
+    @click.option("--clear", is_flag=True, help="Delete all cached thumbnails.")
+    @click.option("--evict", is_flag=True, help="Trim the cache to THUMBNAIL_CACHE_MAX_BYTES now.")
+    def thumbnail_cache(clear, evict):
+        """Show the size of the thumbnail cache."""
+        import shutil
+        from app_package.thumbnails import THUMBNAIL_DIR, cache_usage, evict_thumbnails
+
+        upload_folder = current_app.config["UPLOAD_FOLDER"]
+        max_bytes = current_app.config["THUMBNAIL_CACHE_MAX_BYTES"]
+        if clear:
+            shutil.rmtree(os.path.join(upload_folder, THUMBNAIL_DIR), ignore_errors=True)
+        if evict:
+            click.echo(f"Evicted {evict_thumbnails(upload_folder, max_bytes)} thumbnails")
+        entries = cache_usage(upload_folder)
+        total = sum(size for _, size, _ in entries)
+        click.echo(f"{len(entries)} thumbnails, {total / 1024 / 1024:.1f} MB of {max_bytes / 1024 / 1024:.0f} MB")
+
+    @app.cli.command("seed-fleet")
+    @click.option("--documents", type=int, default=10000, show_default=True, help="Documents to generate (1k to 1M).")
+    @click.option("--vehicles-per-user", type=int, default=10, show_default=True)
+    @click.option("--documents-per-vehicle", type=int, default=4, show_default=True)
+    @click.option("--seed", type=int, default=None, help="Random seed for a reproducible fleet.")
+    @click.option("--batch-size", type=int, default=10000, show_default=True, help="Documents per transaction.")
+    def seed_fleet(documents, vehicles_per_user, documents_per_vehicle, seed, batch_size):
+        """Generate a synthetic fleet for load testing."""
+        from app_package.synthetic import SYNTHETIC_PASSWORD, generate_fleet
+
+        report = generate_fleet(documents, vehicles_per_user=vehicles_per_user,
+                                documents_per_vehicle=documents_per_vehicle, seed=seed, batch_size=batch_size)
+        rate = report["documents"] / report["seconds"] if report["seconds"] else 0.0
+        click.echo(
+            f"Created {report['users']} users, {report['vehicles']} vehicles and {report['documents']} documents "
+            f"in {report['seconds']:.1f}s ({rate:,.0f} documents/s)"
+        )
+        click.echo(f"Log in as {report['first_email']} / {SYNTHETIC_PASSWORD}")
+
+    @app.cli.command("run-scheduler")
+    def run_scheduler_command():
+        """Run the reminder, outbox and OCR jobs in this process (for FAST_STARTUP deployments)."""
+        from app_package.scheduler import run_scheduler
+
+        run_scheduler(current_app._get_current_object())
+
+    @app.cli.command("startup-report")
+    def startup_report():
+        """Show how long this process took to start, by phase."""
+        import sys
+        from app_package import format_startup_timings
+
+        app = current_app._get_current_object()
+        click.echo(format_startup_timings(app.extensions["startup_timings"]))
+        click.echo(f"fast startup: {'on' if app.config['FAST_STARTUP'] else 'off'}, "
+                   f"scheduler: {'running' if 'scheduler' in app.extensions else 'off'}")
+        loaded = [name for name in ("pytesseract", "PIL", "pypdf", "pdf2image", "apscheduler") if name in sys.modules]
+        click.echo(f"heavy modules loaded at startup: {', '.join(loaded) or 'none'}")
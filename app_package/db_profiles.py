@@ -0,0 +1,74 @@
+"""Named database engine profiles, selected with ``DB_PROFILE``.
+
+Postgres profiles size the connection pool per process and recycle and
+pre-ping connections so idle ones dropped by the server are not handed
+out. The SQLite profile switches the database to WAL, so readers no longer
+block the scheduler's writes (or the reverse), and waits on a busy database
+instead of failing with "database is locked".
+"""
+from sqlalchemy import event
+
+ENGINE_PROFILES = {
+    # SQLAlchemy defaults, as before profiles existed
+    "none": {"dialect": None},
+    "sqlite": {
+        "dialect": "sqlite",
+        "engine_options": {"connect_args": {"timeout": 15}},
+        "sqlite_pragmas": {"journal_mode": "WAL", "busy_timeout": 15000, "synchronous": "NORMAL"},
+    },
+    "postgres": {
+        "dialect": "postgresql",
+        "engine_options": {"pool_size": 5, "max_overflow": 5, "pool_timeout": 30,
+                           "pool_pre_ping": True, "pool_recycle": 1800},
+    },
+    # Small managed plans: every gunicorn worker and the scheduler holds its own pool
+    "postgres-small": {
+        "dialect": "postgresql",
+        "engine_options": {"pool_size": 2, "max_overflow": 2, "pool_timeout": 10,
+                           "pool_pre_ping": True, "pool_recycle": 300},
+    },
+}
+
+
+def resolve_profile(name, database_url):
+    """Profile name to use: ``auto`` picks the one for the URL's database."""
+    dialect = "sqlite" if database_url.startswith("sqlite") else "postgresql"
+    if name == "auto":
+        return "sqlite" if dialect == "sqlite" else "postgres"
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}; choose from auto, {', '.join(ENGINE_PROFILES)}")
+    if ENGINE_PROFILES[name]["dialect"] not in (None, dialect):
+        raise ValueError(f"DB_PROFILE {name!r} does not apply to a {dialect} database")
+    return name
+
+
+def engine_options(config):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for the configured profile.
+
+    ``DB_POOL_SIZE`` and ``DB_MAX_OVERFLOW`` override the profile's pool
+    size, and options already in ``SQLALCHEMY_ENGINE_OPTIONS`` win over both.
+    """
+    name = resolve_profile(config["DB_PROFILE"], config["SQLALCHEMY_DATABASE_URI"])
+    options = dict(ENGINE_PROFILES[name].get("engine_options", {}))
+    if ENGINE_PROFILES[name]["dialect"] == "postgresql":
+        if config["DB_POOL_SIZE"] is not None:
+            options["pool_size"] = config["DB_POOL_SIZE"]
+        if config["DB_MAX_OVERFLOW"] is not None:
+            options["max_overflow"] = config["DB_MAX_OVERFLOW"]
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    return options
+
+
+def configure_engine(engine, config):
+    """Install the profile's per-connection setup; call before the first connection."""
+    name = resolve_profile(config["DB_PROFILE"], config["SQLALCHEMY_DATABASE_URI"])
+    pragmas = ENGINE_PROFILES[name].get("sqlite_pragmas")
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
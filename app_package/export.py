@@ -0,0 +1,196 @@
+"""Streaming spreadsheet export of a user's documents.
+
+Rows are read ``EXPORT_BATCH_SIZE`` at a time from a server-side cursor
+(``yield_per``) and each batch is encoded and sent before the next is
+fetched, so memory stays flat however many documents an account has. XLSX
+is written directly as SpreadsheetML into a streamed ZIP, without a
+spreadsheet library.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+from app_package import db
+from app_package.models import Vehicle, Document
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+HEADERS = ["Registration", "Make", "Model", "Document", "Number", "Issuer", "Issue date", "Expiry date",
+           "Days left", "Urgency", "Status", "Notes"]
+
+
+def urgency(days_left):
+    # Same buckets as Document.urgency
+    if days_left is None:
+        return "unknown"
+    if days_left < 0:
+        return "expired"
+    return "warning" if days_left <= 30 else "valid"
+
+
+def export_batches(user_id, clauses, batch_size, today=None):
+    """Run the export query and return an iterator of row lists, one per batch.
+
+    The query is executed here rather than on first iteration, so it runs on
+    whatever bind the calling view selected (e.g. the read replica).
+    """
+    today = today or date.today()
+    result = db.session.execute(
+        db.select(Vehicle.registration_number, Vehicle.make, Vehicle.model, Document.doc_type,
+                  Document.doc_number, Document.issuer, Document.issue_date, Document.expiry_date,
+                  Document.status, Document.notes)
+        .join(Document.vehicle)
+        .where(*clauses)
+        .order_by(Vehicle.registration_number, Vehicle.id, Document.expiry_date.asc().nulls_last(), Document.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    def batches():
+        for partition in result.partitions():
+            rows = []
+            for (registration, make, model, doc_type, number, issuer, issue_date, expiry, status,
+                 notes) in partition:
+                days_left = (expiry - today).days if expiry else None
+                rows.append([registration, make, model, Document.DOC_TYPE_LABELS.get(doc_type, doc_type),
+                             number, issuer, issue_date, expiry, days_left, urgency(days_left), status, notes])
+            yield rows
+    return batches()
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        # Keep user-entered text from being evaluated as a formula by spreadsheet apps
+        return "'" + value
+    return value
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    for rows in batches:
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Documents" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Cell style 1 shows a date serial as a date (built-in number format 14)
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = "</sheetData></worksheet>"
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, int):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_INVALID.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return "<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>"
+
+
+class _ChunkWriter:
+    """Write-only file for ZipFile that hands back what was written since the last call."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_xlsx(batches):
+    # ZipFile writes data descriptors after each member when the output cannot
+    # seek, so the sheet can be compressed and sent as it is generated
+    out = _ChunkWriter()
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS.items():
+            archive.writestr(name, xml)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(HEADERS)).encode("utf-8"))
+            for rows in batches:
+                sheet.write("".join(_xlsx_row(row) for row in rows).encode("utf-8"))
+                yield out.take()
+            sheet.write(_SHEET_END.encode("utf-8"))
+    yield out.take()
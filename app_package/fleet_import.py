@@ -0,0 +1,218 @@
+import csv
+from datetime import date, datetime
+from app_package import db
+from app_package.cache import invalidate_on_commit
+from app_package.models import Vehicle, Document
+
+VEHICLE_COLUMNS = ["registration_number", "make", "model", "year", "vehicle_type", "fuel_type", "notes"]
+# One expiry (and optional number) column pair per document type, e.g. insurance_expiry
+DOCUMENT_COLUMNS = [f"{t}_{suffix}" for t in Document.DOC_TYPES for suffix in ("expiry", "number")]
+
+MAX_REPORTED_ERRORS = 1000
+MIN_YEAR = 1900  # vehicle years run from here to next year's models
+
+# What a decoder opened with errors="replace" puts in place of bytes that are not UTF-8
+UNDECODABLE = "\ufffd"
+NOT_UTF8 = 'The file is not UTF-8 encoded; save it as "CSV UTF-8" and import it again.'
+
+
+class RowError(ValueError):
+    pass
+
+
+class UndecodableRowError(RowError):
+    pass
+
+
+def parse_csv_date(value):
+    """Accept ISO (2027-03-12) or Indian day-first (12/03/2027, 12-03-2027) dates."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f"invalid date {value!r}")
+
+
+def parse_row(row):
+    """Validate one CSV row; returns ``(vehicle_fields, {doc_type: (expiry, number)})``."""
+    def cell(name):
+        return (row.get(name) or "").strip()
+
+    if any(isinstance(value, str) and UNDECODABLE in value for value in row.values()):
+        raise UndecodableRowError("contains characters that are not valid UTF-8")
+
+    registration_number = cell("registration_number").upper()
+    if not registration_number:
+        raise RowError("registration_number is required")
+    if len(registration_number) > 20:
+        raise RowError("registration_number is longer than 20 characters")
+
+    vehicle = {"registration_number": registration_number}
+    for name in ("make", "model"):
+        if cell(name):
+            vehicle[name] = cell(name)[:50]
+    if cell("notes"):
+        vehicle["notes"] = cell("notes")
+    if cell("year"):
+        try:
+            year = int(cell("year"))
+        except ValueError:
+            raise RowError(f"invalid year {cell('year')!r}")
+        if not MIN_YEAR <= year <= date.today().year + 1:
+            raise RowError(f"year {year} is not between {MIN_YEAR} and {date.today().year + 1}")
+        vehicle["year"] = year
+    if cell("vehicle_type"):
+        if cell("vehicle_type").lower() not in Vehicle.VEHICLE_TYPES:
+            raise RowError(f"unknown vehicle_type {cell('vehicle_type')!r}")
+        vehicle["vehicle_type"] = cell("vehicle_type").lower()
+    if cell("fuel_type"):
+        if cell("fuel_type").lower() not in Vehicle.FUEL_TYPES:
+            raise RowError(f"unknown fuel_type {cell('fuel_type')!r}")
+        vehicle["fuel_type"] = cell("fuel_type").lower()
+
+    documents = {}
+    for doc_type in Document.DOC_TYPES:
+        expiry = cell(f"{doc_type}_expiry")
+        if expiry:
+            documents[doc_type] = (parse_csv_date(expiry), cell(f"{doc_type}_number")[:50] or None)
+    return vehicle, documents
+
+
+def _import_batch(user_id, batch, report):
+    """Upsert one batch of parsed rows in a single transaction."""
+    # Bulk statements bypass the session events the page cache listens to
+    invalidate_on_commit(db.session, user_id)
+    # Later rows for the same registration number win
+    rows = {}
+    for vehicle, documents in batch:
+        previous = rows.get(vehicle["registration_number"])
+        if previous:
+            previous[0].update(vehicle)
+            previous[1].update(documents)
+        else:
+            rows[vehicle["registration_number"]] = (vehicle, documents)
+
+    existing = dict(db.session.execute(
+        db.select(Vehicle.registration_number, Vehicle.id)
+        .where(Vehicle.user_id == user_id, Vehicle.registration_number.in_(rows))
+    ).all())
+
+    updates = [dict(fields, id=existing[reg]) for reg, (fields, _) in rows.items() if reg in existing]
+    if updates:
+        db.session.execute(db.update(Vehicle), updates)
+        report["vehicles_updated"] += len(updates)
+
+    inserts = [
+        dict({"make": None, "model": None, "year": None, "vehicle_type": None, "fuel_type": None, "notes": None},
+             **fields, user_id=user_id, is_active=True, created_at=datetime.utcnow())
+        for reg, (fields, _) in rows.items() if reg not in existing
+    ]
+    if inserts:
+        created = db.session.execute(
+            db.insert(Vehicle).returning(Vehicle.registration_number, Vehicle.id), inserts
+        ).all()
+        existing.update(dict(created))
+        report["vehicles_created"] += len(inserts)
+
+    # Upsert documents: update the active document of each type, else add one
+    vehicle_ids = [existing[reg] for reg, (_, documents) in rows.items() if documents]
+    if not vehicle_ids:
+        return
+    current_docs = {}
+    for doc_id, vehicle_id, doc_type, reminder_days in db.session.execute(
+        db.select(Document.id, Document.vehicle_id, Document.doc_type, Document.reminder_days)
+        .where(Document.vehicle_id.in_(vehicle_ids), Document.status == "active")
+        .order_by(Document.id)
+    ):
+        current_docs[(vehicle_id, doc_type)] = (doc_id, reminder_days)
+
+    doc_updates, doc_inserts = [], []
+    now = datetime.utcnow()
+    for reg, (_, documents) in rows.items():
+        vehicle_id = existing[reg]
+        for doc_type, (expiry, number) in documents.items():
+            # Bulk statements skip the ORM events, so next_reminder_at is set here
+            current = current_docs.get((vehicle_id, doc_type))
+            if current:
+                doc_id, reminder_days = current
+                update = {
+                    "id": doc_id, "expiry_date": expiry, "updated_at": now,
+                    "next_reminder_at": Document.compute_next_reminder_at(expiry, reminder_days, "active"),
+                }
+                if number:
+                    update["doc_number"] = number
+                doc_updates.append(update)
+            else:
+                doc_inserts.append({
+                    "vehicle_id": vehicle_id, "doc_type": doc_type, "doc_number": number,
+                    "expiry_date": expiry, "reminder_days": 30, "status": "active",
+                    "next_reminder_at": Document.compute_next_reminder_at(expiry, 30, "active"),
+                    "created_at": now, "updated_at": now,
+                })
+    if doc_updates:
+        db.session.execute(db.update(Document), doc_updates)
+        report["documents_updated"] += len(doc_updates)
+    if doc_inserts:
+        db.session.execute(db.insert(Document), doc_inserts)
+        report["documents_created"] += len(doc_inserts)
+
+
+def import_fleet_csv(stream, user_id, batch_size=1000):
+    """Stream a fleet CSV into ``user_id``'s vehicles and documents.
+
+    Rows are validated one at a time and upserted on registration number in
+    batches, each committed in its own transaction. Invalid rows are skipped
+    and reported by line number; they never abort the import. Open ``stream``
+    with ``errors="replace"``: rows with undecodable bytes are then skipped,
+    and a file-level error (line None) explains the encoding problem.
+    """
+    report = {
+        "rows": 0, "vehicles_created": 0, "vehicles_updated": 0,
+        "documents_created": 0, "documents_updated": 0, "error_count": 0, "errors": [],
+    }
+    reader = csv.DictReader(stream)
+    try:
+        reader.fieldnames  # reads the header, decoding the first chunk of the file
+    except UnicodeDecodeError:
+        report["error_count"] = 1
+        report["errors"].append((None, NOT_UTF8))
+        return report
+    if reader.fieldnames:
+        reader.fieldnames = [f.strip().lower() for f in reader.fieldnames]
+    if not reader.fieldnames or "registration_number" not in reader.fieldnames:
+        report["error_count"] = 1
+        report["errors"].append((1, "missing registration_number column"))
+        return report
+
+    batch = []
+    not_utf8 = False
+    try:
+        for row in reader:
+            report["rows"] += 1
+            try:
+                batch.append(parse_row(row))
+            except RowError as e:
+                not_utf8 = not_utf8 or isinstance(e, UndecodableRowError)
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append((reader.line_num, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                _import_batch(user_id, batch, report)
+                db.session.commit()
+                batch = []
+    except UnicodeDecodeError:
+        # A strictly decoded stream cannot go past the bad bytes; keep what was read
+        not_utf8 = True
+        report["error_count"] += 1
+    if batch:
+        _import_batch(user_id, batch, report)
+        db.session.commit()
+    if not_utf8:
+        report["errors"].insert(0, (None, NOT_UTF8))
+    return report
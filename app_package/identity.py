@@ -0,0 +1,80 @@
+"""Cached session identity: the logged-in user and the vehicles they own.
+
+``load_user`` runs on every authenticated request, and most views then need
+the user's active vehicles for a dropdown or to check that a document is
+theirs. Both come from one cached snapshot, so a typical page needs no
+queries for either. The snapshot is dropped whenever the user's vehicles or
+documents change (see ``cache``), and lasts ``IDENTITY_CACHE_TTL`` at most.
+"""
+from flask import current_app
+from flask_login import UserMixin
+from app_package import db
+from app_package.cache import cached, get_cache, session_user_key
+from app_package.models import User, Vehicle
+
+
+class SessionUser(UserMixin):
+    """What ``current_user`` is on requests after login: plain data, not a User row."""
+
+    def __init__(self, snapshot):
+        self.id = snapshot["id"]
+        self.name = snapshot["name"]
+        self.email = snapshot["email"]
+
+
+def _snapshot(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    vehicles = db.session.execute(
+        db.select(Vehicle.id, Vehicle.registration_number, Vehicle.make, Vehicle.model, Vehicle.is_active)
+        .where(Vehicle.user_id == user_id)
+        .order_by(Vehicle.id)
+    ).all()
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "vehicle_ids": frozenset(v.id for v in vehicles),
+        "vehicles": [
+            {"id": v.id, "registration_number": v.registration_number, "make": v.make, "model": v.model}
+            for v in vehicles if v.is_active
+        ],
+    }
+
+
+def session_snapshot(user_id):
+    return cached("identity", session_user_key(user_id), current_app.config["IDENTITY_CACHE_TTL"],
+                  lambda: _snapshot(user_id))
+
+
+def load_session_user(user_id):
+    """Flask-Login ``user_loader``."""
+    snapshot = session_snapshot(user_id)
+    return SessionUser(snapshot) if snapshot else None
+
+
+def active_vehicles(user_id):
+    """``user_id``'s active vehicles as plain dicts for dropdowns (id, registration_number, make, model)."""
+    snapshot = session_snapshot(user_id)
+    return snapshot["vehicles"] if snapshot else []
+
+
+def owns_vehicle(user_id, vehicle_id):
+    """True if ``vehicle_id`` (active or not) belongs to ``user_id``.
+
+    A vehicle missing from the snapshot is checked against the database
+    before being refused: with the in-process cache another worker may have
+    added it after this one cached the snapshot.
+    """
+    if vehicle_id is None:
+        return False
+    snapshot = session_snapshot(user_id)
+    if snapshot and vehicle_id in snapshot["vehicle_ids"]:
+        return True
+    owner = db.session.scalar(db.select(Vehicle.user_id).where(Vehicle.id == vehicle_id))
+    if owner != user_id:
+        return False
+    if get_cache() is not None:
+        get_cache().delete(session_user_key(user_id))
+    return True
@@ -0,0 +1,89 @@
+"""Database-backed locks so only one process runs each scheduled job.
+
+Every gunicorn worker starts its own scheduler, so each job first takes a
+named lock and skips the run when another process holds it. Postgres uses
+a session-level advisory lock on a dedicated connection, which the server
+drops by itself if the process dies. Other databases use a lease row in
+``scheduler_leases`` whose expiry lets another process take over from a
+holder that crashed.
+"""
+import hashlib
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, text, update
+from sqlalchemy.exc import IntegrityError
+from app_package.models import SchedulerLease
+
+
+def new_holder_id():
+    """Unique per acquisition, so threads of one process never share a lease."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+def advisory_key(name):
+    """Stable signed 64-bit key for ``pg_try_advisory_lock``."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+@contextmanager
+def _advisory_lock(engine, name):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        key = advisory_key(name)
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
+
+def acquire_lease(engine, name, ttl_seconds, holder):
+    """Take or renew the lease ``name``; returns True when ``holder`` now owns it."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    lease = SchedulerLease.__table__
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(lease).values(name=name, holder=holder, expires_at=expires_at))
+        return True
+    except IntegrityError:
+        pass
+    # The row exists: take it over only if it expired (or is already ours)
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(lease)
+            .where(lease.c.name == name, (lease.c.expires_at < now) | (lease.c.holder == holder))
+            .values(holder=holder, expires_at=expires_at)
+        )
+    return result.rowcount == 1
+
+
+def release_lease(engine, name, holder):
+    lease = SchedulerLease.__table__
+    with engine.begin() as conn:
+        conn.execute(delete(lease).where(lease.c.name == name, lease.c.holder == holder))
+
+
+@contextmanager
+def _lease_lock(engine, name, ttl_seconds):
+    holder = new_holder_id()
+    acquired = acquire_lease(engine, name, ttl_seconds, holder)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            release_lease(engine, name, holder)
+
+
+def job_lock(engine, name, ttl_seconds):
+    """Context manager yielding True if this process got the lock ``name``.
+
+    ``ttl_seconds`` bounds how long a crashed holder can block the lease
+    fallback; it should exceed the longest expected run of the job.
+    """
+    if engine.dialect.name == "postgresql":
+        return _advisory_lock(engine, name)
+    return _lease_lock(engine, name, ttl_seconds)
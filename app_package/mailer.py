@@ -0,0 +1,142 @@
+import time
+from datetime import datetime, timedelta
+from flask_mail import Message
+from app_package import db, mail, metrics
+from app_package.models import OutboxMessage
+
+
+def claim_messages(limit, send_timeout):
+    """Reserve up to ``limit`` due messages for this sender and return them.
+
+    Claiming pushes ``next_attempt_at`` past the send timeout with a
+    conditional UPDATE, so concurrent senders never pick the same message
+    and a sender that dies mid-batch only delays its messages.
+    """
+    now = datetime.utcnow()
+    candidate_ids = db.session.execute(
+        db.select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(limit)
+    ).scalars().all()
+
+    claimed = []
+    for message_id in candidate_ids:
+        result = db.session.execute(
+            db.update(OutboxMessage)
+            .where(OutboxMessage.id == message_id, OutboxMessage.status == "pending",
+                   OutboxMessage.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=send_timeout), attempts=OutboxMessage.attempts + 1)
+        )
+        if result.rowcount == 1:
+            claimed.append(message_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return db.session.execute(
+        db.select(OutboxMessage).where(OutboxMessage.id.in_(claimed)).order_by(OutboxMessage.id)
+    ).scalars().all()
+
+
+def retry_delay(attempts, base, maximum):
+    """Exponential backoff: ``base`` seconds after the first failure, doubling up to ``maximum``."""
+    return min(base * 2 ** (attempts - 1), maximum)
+
+
+def mark_failed(message, error, max_attempts, retry_base, retry_max):
+    message.last_error = str(error)
+    if message.attempts >= max_attempts:
+        message.status = "failed"
+    else:
+        message.next_attempt_at = datetime.utcnow() + timedelta(
+            seconds=retry_delay(message.attempts, retry_base, retry_max)
+        )
+
+
+class RateLimiter:
+    """Space calls at least ``1 / rate`` seconds apart (``rate`` <= 0 disables it)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_slot > now:
+            time.sleep(self.next_slot - now)
+            now = self.next_slot
+        self.next_slot = now + self.interval
+
+
+def _send_batch(messages, limiter, config, stats):
+    """Send ``messages`` over one SMTP connection, reconnecting after a failed send."""
+    remaining = list(messages)
+    while remaining:
+        try:
+            with mail.connect() as conn:
+                while remaining:
+                    message = remaining.pop(0)
+                    limiter.wait()
+                    try:
+                        conn.send(Message(subject=message.subject, recipients=[message.recipient],
+                                          body=message.body))
+                    except Exception as e:
+                        # The connection may be unusable after an SMTP error; open a new one
+                        mark_failed(message, e, config["OUTBOX_MAX_ATTEMPTS"],
+                                    config["OUTBOX_RETRY_BASE"], config["OUTBOX_RETRY_MAX"])
+                        stats["failed"] += 1
+                        metrics.EMAILS_SENT.inc(result="failed")
+                        print(f"[Outbox] Failed to send message {message.id} to {message.recipient}: {e}")
+                        break
+                    message.status = "sent"
+                    message.sent_at = datetime.utcnow()
+                    message.last_error = None
+                    stats["sent"] += 1
+                    metrics.EMAILS_SENT.inc(result="sent")
+        except Exception as e:
+            # Could not connect: every message still waiting goes back for a later retry
+            print(f"[Outbox] SMTP connection failed: {e}")
+            for message in remaining:
+                mark_failed(message, e, config["OUTBOX_MAX_ATTEMPTS"],
+                            config["OUTBOX_RETRY_BASE"], config["OUTBOX_RETRY_MAX"])
+                stats["failed"] += 1
+                metrics.EMAILS_SENT.inc(result="failed")
+            remaining = []
+
+
+def deliver_outbox(app, batch_size=None, rate=None, max_batches=None):
+    """Send due outbox messages in batches, one SMTP connection per batch.
+
+    Each batch's delivery status is committed before the next one is claimed.
+    Returns ``{"sent", "failed", "batches", "seconds"}``.
+    """
+    with app.app_context():
+        config = app.config
+        batch_size = batch_size or config["OUTBOX_BATCH_SIZE"]
+        limiter = RateLimiter(config["OUTBOX_RATE_LIMIT"] if rate is None else rate)
+        stats = {"sent": 0, "failed": 0, "batches": 0, "seconds": 0.0}
+        started = time.monotonic()
+
+        while max_batches is None or stats["batches"] < max_batches:
+            messages = claim_messages(batch_size, config["OUTBOX_SEND_TIMEOUT"])
+            if not messages:
+                break
+            stats["batches"] += 1
+            _send_batch(messages, limiter, config, stats)
+            db.session.commit()
+
+        stats["seconds"] = time.monotonic() - started
+        if stats["sent"] or stats["failed"]:
+            print(f"[Outbox] Delivered {stats['sent']} emails ({stats['failed']} failed) "
+                  f"in {stats['seconds']:.1f}s")
+        return stats
+
+
+def outbox_counts():
+    """Number of outbox messages per status."""
+    return dict(db.session.execute(
+        db.select(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status)
+    ).all())
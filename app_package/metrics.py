@@ -0,0 +1,211 @@
+"""In-process performance metrics and the Prometheus ``/metrics`` endpoint.
+
+Request latency and per-endpoint SQL counts come from Flask request hooks
+and SQLAlchemy cursor events; OCR and the scheduler record their own
+timings. Metrics are kept per process, so with several gunicorn workers
+each scrape sees the worker that answered it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OCR_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SLOW_LOG_MAX_QUERIES = 50
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, dict(value) if isinstance(value, dict) else value)
+                           for key, value in self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._label_text(key)} {value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key, state):
+        lines = [
+            f"{self.name}_bucket{self._label_text(key, [('le', bound)])} {count}"
+            for bound, count in zip(self.buckets, state["buckets"])
+        ]
+        lines.append(f"{self.name}_bucket{self._label_text(key, [('le', '+Inf')])} {state['count']}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {state['sum']}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {state['count']}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.", ("endpoint", "method", "status"))
+REQUEST_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL statements issued per request.", ("endpoint",), QUERY_COUNT_BUCKETS)
+SQL_QUERIES = Counter("sql_queries_total", "SQL statements executed, by endpoint.", ("endpoint",))
+SQL_SECONDS = Counter("sql_query_seconds_total", "Time spent in SQL statements, by endpoint.", ("endpoint",))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("endpoint",))
+OCR_SECONDS = Histogram("ocr_duration_seconds", "Expiry extraction time per file.", ("kind",), OCR_BUCKETS)
+SWEEP_SECONDS = Histogram("reminder_sweep_duration_seconds", "Reminder sweep duration.")
+SWEEP_DOCUMENTS = Counter("reminder_documents_total", "Documents included in reminder emails.")
+EMAILS_QUEUED = Counter("reminder_emails_queued_total", "Reminder emails queued in the outbox.")
+LAST_SWEEP = Gauge("reminder_sweep_last_run_timestamp_seconds", "Unix time the last reminder sweep finished.")
+EMAILS_SENT = Counter("outbox_emails_total", "Outbox delivery attempts by result.", ("result",))
+STARTUP_SECONDS = Gauge("app_startup_phase_seconds", "Time this process spent in each startup phase.", ("phase",))
+CACHE_REQUESTS = Counter("cache_requests_total", "Page data cache lookups by result.", ("cache", "result"))
+
+REGISTRY = [
+    REQUEST_SECONDS, REQUEST_QUERIES, SQL_QUERIES, SQL_SECONDS, SLOW_REQUESTS, OCR_SECONDS,
+    SWEEP_SECONDS, SWEEP_DOCUMENTS, EMAILS_QUEUED, LAST_SWEEP, EMAILS_SENT, CACHE_REQUESTS,
+    STARTUP_SECONDS,
+]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def count_queries(*engines):
+    """Count the SQL statements issued on ``engines`` inside the block."""
+    counter = {"queries": 0}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _on_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or not conn.info.get("query_start"):
+        return
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = g.get("_sql_stats")
+    if stats is None:
+        return
+    stats["queries"] += 1
+    stats["seconds"] += elapsed
+    if stats["statements"] is not None and len(stats["statements"]) < SLOW_LOG_MAX_QUERIES:
+        stats["statements"].append((elapsed, " ".join(statement.split())))
+
+
+def init_metrics(app, *engines):
+    """Install the request hooks, the SQL hooks on ``engines`` (every bind) and the ``/metrics`` route."""
+    slow_ms = app.config["SLOW_REQUEST_MS"]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+        # Statement text is only kept when the slow-request log may need it
+        g._sql_stats = {"queries": 0, "seconds": 0.0, "statements": [] if slow_ms else None}
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_request_start", None)
+        stats = g.pop("_sql_stats", None)
+        if start is None or request.endpoint == "metrics":
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(stats["queries"], endpoint=endpoint)
+        SQL_QUERIES.inc(stats["queries"], endpoint=endpoint)
+        SQL_SECONDS.inc(stats["seconds"], endpoint=endpoint)
+
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            print(
+                f"[Slow] {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+                f"in {elapsed * 1000:.0f}ms, {stats['queries']} queries ({stats['seconds'] * 1000:.0f}ms SQL)"
+            )
+            for seconds, statement in stats["statements"]:
+                print(f"[Slow]   {seconds * 1000:7.1f}ms  {statement[:300]}")
+        return response
+
+    @app.route("/metrics", endpoint="metrics")
+    def metrics():
+        if not app.config["METRICS_ENABLED"]:
+            abort(404)
+        token = app.config["METRICS_TOKEN"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
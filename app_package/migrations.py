@@ -0,0 +1,240 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` only creates missing tables; it never adds indexes or
+columns to tables that already exist. Each migration here is a numbered,
+idempotent step, and the applied versions are recorded in ``schema_version``
+so an existing SQLite or Postgres database can be brought up to date with
+``flask db-upgrade``.
+"""
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, bindparam, func, inspect, select, text,
+                        update)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register ``fn(conn)`` as schema migration ``version``."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def create_index(conn, table_name, index_name):
+    """Create a model-declared index if it does not exist yet."""
+    from app_package import db
+
+    table = db.metadata.tables[table_name]
+    index = next(i for i in table.indexes if i.name == index_name)
+    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def add_column(conn, table_name, column_name):
+    """Add a model-declared column to an existing table if it is missing."""
+    from app_package import db
+
+    def exists():
+        return column_name in {c["name"] for c in inspect(conn).get_columns(table_name)}
+
+    if exists():
+        return
+    column = db.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+    except DBAPIError:
+        # Added by another process between the check and the ALTER
+        if not exists():
+            raise
+
+
+def create_table(conn, table_name):
+    from app_package import db
+
+    try:
+        with conn.begin_nested():
+            db.metadata.tables[table_name].create(conn, checkfirst=True)
+    except DBAPIError:
+        # Created by another process after the check
+        if not inspect(conn).has_table(table_name):
+            raise
+
+
+@migration(1, "Composite and partial indexes for the hot query shapes")
+def _hot_path_indexes(conn):
+    create_table(conn, "ocr_jobs")
+    create_index(conn, "vehicles", "ix_vehicles_user_active")
+    create_index(conn, "documents", "ix_documents_vehicle_status_expiry")
+    create_index(conn, "documents", "ix_documents_active_expiry")
+    create_index(conn, "reminder_logs", "ix_reminder_logs_document_type_sent")
+    create_index(conn, "ocr_jobs", "ix_ocr_jobs_pending")
+    create_index(conn, "ocr_jobs", "ix_ocr_jobs_document")
+
+
+@migration(2, "Outbox table for queued reminder emails")
+def _outbox(conn):
+    create_table(conn, "outbox_messages")
+    create_index(conn, "outbox_messages", "ix_outbox_messages_due")
+
+
+@migration(3, "Lease table for scheduler leader election")
+def _scheduler_leases(conn):
+    create_table(conn, "scheduler_leases")
+
+
+@migration(4, "Document.next_reminder_at due-date queue")
+def _next_reminder_at(conn):
+    from app_package.models import Document
+
+    add_column(conn, "documents", "next_reminder_at")
+    create_index(conn, "documents", "ix_documents_next_reminder")
+
+    documents = Document.__table__
+    rows = conn.execute(
+        select(documents.c.id, documents.c.expiry_date, documents.c.reminder_days, documents.c.status)
+        .where(documents.c.next_reminder_at.is_(None), documents.c.expiry_date.isnot(None),
+               documents.c.status == "active")
+    ).all()
+    params = [
+        {"doc_id": doc_id, "next_reminder_at": Document.compute_next_reminder_at(expiry, days, status)}
+        for doc_id, expiry, days, status in rows
+    ]
+    if params:
+        conn.execute(
+            update(documents).where(documents.c.id == bindparam("doc_id"))
+            .values(next_reminder_at=bindparam("next_reminder_at")),
+            params,
+        )
+
+
+@migration(5, "Reference-counted content-addressed upload blobs")
+def _stored_files(conn):
+    create_table(conn, "stored_files")
+
+
+@migration(6, "Index documents by stored file path for download checks")
+def _documents_file_path(conn):
+    create_index(conn, "documents", "ix_documents_file_path")
+
+
+@migration(7, "Background OCR queue for bulk-upload archives")
+def _bulk_ocr_jobs(conn):
+    create_table(conn, "bulk_ocr_jobs")
+    create_index(conn, "bulk_ocr_jobs", "ix_bulk_ocr_jobs_pending")
+    create_index(conn, "bulk_ocr_jobs", "ix_bulk_ocr_jobs_token")
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn):
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(
+        schema_version.select().with_only_columns(schema_version.c.version).order_by(
+            schema_version.c.version.desc()
+        ).limit(1)
+    ).scalar() or 0
+
+
+def recorded_version(engine):
+    """Schema version in one query, without the catalogue lookups of ``current_version``.
+
+    Returns 0 when ``schema_version`` does not exist yet.
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+@contextmanager
+def schema_lock(engine, timeout=600):
+    """Hold a cross-process lock while creating tables and applying migrations.
+
+    Every worker does both at startup, and concurrent DDL fails with
+    "already exists" errors. Postgres waits on an advisory lock. A
+    file-backed SQLite database waits on an exclusive transaction in a
+    ``.schema-lock`` file next to it, which the OS releases if the holder dies.
+    """
+    if engine.dialect.name == "postgresql":
+        from app_package.leader import advisory_key
+
+        key = advisory_key("schema-upgrade")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        lock = sqlite3.connect(engine.url.database + ".schema-lock", timeout=timeout, isolation_level=None)
+        try:
+            lock.execute("BEGIN EXCLUSIVE")
+            yield
+        finally:
+            lock.close()
+    else:
+        yield
+
+
+def create_and_upgrade(engine, create_all, target=None):
+    """Run ``create_all()`` then ``upgrade`` under ``schema_lock``; returns the versions applied."""
+    with schema_lock(engine):
+        create_all()
+        return upgrade(engine, target=target)
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations in order; returns the versions applied.
+
+    Each migration runs in its own transaction together with its version row.
+    Call it under ``schema_lock`` (see ``create_and_upgrade``): the version is
+    read only once the lock is held, so a process that waited on another's
+    upgrade finds nothing left to do. Without the lock, a migration that fails
+    because another process applied it first is skipped once its version row
+    shows up.
+    """
+    target = latest_version() if target is None else target
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        current = current_version(conn)
+
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(schema_version.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow(),
+                ))
+        except DBAPIError:
+            # Duplicate version row, or DDL for objects another process just created
+            with engine.connect() as conn:
+                if current_version(conn) >= version:
+                    continue
+            raise
+        applied.append(version)
+        print(f"[Migrate] Applied {version}: {description}")
+    return applied
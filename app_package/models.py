@@ -1,4 +1,4 @@
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app_package import db
@@ -27,6 +27,13 @@ class User(UserMixin, db.Model):
 class Vehicle(db.Model):
     __tablename__ = "vehicles"
 
+    VEHICLE_TYPES = ["car", "bike", "truck", "bus", "auto"]
+    FUEL_TYPES = ["petrol", "diesel", "cng", "electric"]
+
+    __table_args__ = (
+        db.Index("ix_vehicles_user_active", "user_id", "is_active"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     registration_number = db.Column(db.String(20), nullable=False)
@@ -41,13 +48,66 @@ class Vehicle(db.Model):
 
     documents = db.relationship("Document", backref="vehicle", lazy=True, cascade="all, delete-orphan")
 
+    # Filled by load_expiry_summaries(): (document_count, nearest active Document or None)
+    _expiry_summary = None
+
+    @property
+    def document_count(self):
+        if self._expiry_summary is not None:
+            return self._expiry_summary[0]
+        return db.session.scalar(
+            db.select(db.func.count(Document.id)).where(Document.vehicle_id == self.id)
+        )
+
     @property
     def nearest_expiry(self):
-        today = date.today()
-        active_docs = [d for d in self.documents if d.expiry_date and d.status == "active"]
-        if not active_docs:
-            return None
-        return min(active_docs, key=lambda d: d.expiry_date)
+        """Active document with the soonest expiry date, without loading ``documents``."""
+        if self._expiry_summary is not None:
+            return self._expiry_summary[1]
+        return db.session.scalar(
+            db.select(Document)
+            .where(Document.vehicle_id == self.id, Document.status == "active", Document.expiry_date.isnot(None))
+            .order_by(Document.expiry_date, Document.id)
+            .limit(1)
+        )
+
+    @classmethod
+    def load_expiry_summaries(cls, vehicles):
+        """Attach document counts and nearest active expiry to ``vehicles`` in one query.
+
+        A window over each vehicle's documents counts them and ranks active,
+        dated documents first by expiry; the top-ranked row per vehicle is
+        joined back to its Document when it qualifies.
+        """
+        by_id = {v.id: v for v in vehicles}
+        if not by_id:
+            return vehicles
+
+        is_tracked = db.and_(Document.status == "active", Document.expiry_date.isnot(None))
+        ranked = (
+            db.select(
+                Document.id.label("document_id"),
+                Document.vehicle_id,
+                db.func.count().over(partition_by=Document.vehicle_id).label("document_count"),
+                db.func.row_number().over(
+                    partition_by=Document.vehicle_id,
+                    order_by=(db.case((is_tracked, 0), else_=1), Document.expiry_date, Document.id),
+                ).label("rank"),
+            )
+            .where(Document.vehicle_id.in_(by_id))
+            .subquery()
+        )
+        rows = db.session.execute(
+            db.select(ranked.c.vehicle_id, ranked.c.document_count, Document)
+            .outerjoin(Document, db.and_(Document.id == ranked.c.document_id, is_tracked))
+            .where(ranked.c.rank == 1)
+        ).all()
+
+        for vehicle in vehicles:
+            vehicle._expiry_summary = (0, None)
+        for vehicle_id, document_count, nearest in rows:
+            by_id[vehicle_id]._expiry_summary = (document_count, nearest)
+        return vehicles
 
 
 class Document(db.Model):
@@ -64,6 +124,23 @@ class Document(db.Model):
         "dl": "Driving License",
     }
 
+    __table_args__ = (
+        # Per-account listings: vehicle_id IN (...) AND status = ? ORDER BY expiry_date
+        db.Index("ix_documents_vehicle_status_expiry", "vehicle_id", "status", "expiry_date"),
+        # Reminder sweep across all accounts only ever looks at active documents
+        db.Index(
+            "ix_documents_active_expiry", "expiry_date",
+            postgresql_where=db.text("status = 'active'"),
+            sqlite_where=db.text("status = 'active'"),
+        ),
+        # The reminder job only pulls documents whose next reminder is due
+        db.Index("ix_documents_next_reminder", "next_reminder_at"),
+        # File downloads check ownership by the stored path
+        db.Index("ix_documents_file_path", "file_path"),
+    )
+
+    REMINDER_HOUR = 8  # local time at which a document's reminders fall due
+
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey("vehicles.id"), nullable=False)
     doc_type = db.Column(db.String(20), nullable=False)
@@ -77,10 +154,14 @@ class Document(db.Model):
     reminder_days = db.Column(db.Integer, default=30)
     status = db.Column(db.String(20), default="active")  # active/expired/renewed
     notes = db.Column(db.Text)
+    # Local time the next reminder is due; None for documents that never need one
+    next_reminder_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     reminder_logs = db.relationship("ReminderLog", backref="document", lazy=True, cascade="all, delete-orphan")
+    ocr_jobs = db.relationship("OcrJob", backref="document", lazy=True, cascade="all, delete-orphan",
+                               order_by="OcrJob.id")
 
     @property
     def doc_type_label(self):
@@ -103,12 +184,141 @@ class Document(db.Model):
             return "warning"
         return "valid"
 
+    @property
+    def ocr_job(self):
+        """Most recent OCR job for this document, if any."""
+        return self.ocr_jobs[-1] if self.ocr_jobs else None
+
+    @classmethod
+    def compute_next_reminder_at(cls, expiry_date, reminder_days, status):
+        """When the first reminder for a document is due: ``reminder_days`` before expiry."""
+        # Column defaults are not applied yet when a new document is flushed
+        status = status or "active"
+        reminder_days = 30 if reminder_days is None else reminder_days
+        if status != "active" or not expiry_date:
+            return None
+        return datetime.combine(expiry_date - timedelta(days=reminder_days), time(cls.REMINDER_HOUR))
+
+
+@db.event.listens_for(Document, "before_insert")
+@db.event.listens_for(Document, "before_update")
+def _schedule_next_reminder(mapper, connection, doc):
+    state = db.inspect(doc)
+    if state.persistent and not any(
+        state.attrs[name].history.has_changes() for name in ("expiry_date", "reminder_days", "status")
+    ):
+        return
+    doc.next_reminder_at = Document.compute_next_reminder_at(doc.expiry_date, doc.reminder_days, doc.status)
+
 
 class ReminderLog(db.Model):
     __tablename__ = "reminder_logs"
+    __table_args__ = (
+        # "Already emailed today?" checks use a sent_at range, not date(sent_at)
+        db.Index("ix_reminder_logs_document_type_sent", "document_id", "reminder_type", "sent_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.Integer, db.ForeignKey("documents.id"), nullable=False)
     reminder_type = db.Column(db.String(20))  # dashboard/email
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     message = db.Column(db.Text)
+
+
+class OcrJob(db.Model):
+    __tablename__ = "ocr_jobs"
+    __table_args__ = (
+        db.Index(
+            "ix_ocr_jobs_pending", "id",
+            postgresql_where=db.text("status = 'pending'"),
+            sqlite_where=db.text("status = 'pending'"),
+        ),
+        db.Index("ix_ocr_jobs_document", "document_id"),
+    )
+
+    STATUSES = ["pending", "running", "done", "failed"]
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey("documents.id"), nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending/running/done/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class BulkOcrJob(db.Model):
+    """OCR of one staged file from a bulk-upload archive, before any Document exists."""
+    __tablename__ = "bulk_ocr_jobs"
+    __table_args__ = (
+        db.Index(
+            "ix_bulk_ocr_jobs_pending", "id",
+            postgresql_where=db.text("status = 'pending'"),
+            sqlite_where=db.text("status = 'pending'"),
+        ),
+        db.Index("ix_bulk_ocr_jobs_token", "token"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    token = db.Column(db.String(32), nullable=False)  # staging batch
+    entry = db.Column(db.Integer, nullable=False)  # index into the batch manifest's entries
+    staged_path = db.Column(db.String(256), nullable=False)  # relative to UPLOAD_FOLDER
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending/running/done/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    # Proposals for the review page
+    ocr_date = db.Column(db.Date)
+    vehicle_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class OutboxMessage(db.Model):
+    """An email waiting to be delivered, or the record of one that was."""
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        db.Index(
+            "ix_outbox_messages_due", "next_attempt_at",
+            postgresql_where=db.text("status = 'pending'"),
+            sqlite_where=db.text("status = 'pending'"),
+        ),
+    )
+
+    STATUSES = ["pending", "sent", "failed"]
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending/sent/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    # While a sender holds the message this is pushed out by OUTBOX_SEND_TIMEOUT,
+    # so a crashed sender's messages become due again on their own
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+class SchedulerLease(db.Model):
+    """A named lock row with an expiry, used for scheduler leader election on SQLite."""
+    __tablename__ = "scheduler_leases"
+
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class StoredFile(db.Model):
+    """A content-addressed upload blob and how many documents reference it."""
+    __tablename__ = "stored_files"
+
+    path = db.Column(db.String(256), primary_key=True)  # ab/cd/<sha256>.<ext>, relative to UPLOAD_FOLDER
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import date
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    expiry_date TEXT,
+    parser_version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_ocr_results_last_used ON ocr_results (last_used);
+CREATE TABLE IF NOT EXISTS ocr_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """Persistent OCR result cache keyed on file content and tesseract setup.
+
+    Backed by a standalone SQLite file so OCR worker processes can share it
+    without an app context. Entries are evicted least-recently-used once the
+    cache holds more than ``max_entries`` results.
+    """
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # SQLite connections must not cross a fork, so open one per process
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(file_path, engine_version, engine_config):
+        return f"{file_digest(file_path)}:{engine_version}:{engine_config}"
+
+    def get(self, key):
+        """Return ``(text, expiry_date, parser_version)`` or None, counting the hit/miss."""
+        row = self.conn.execute(
+            "SELECT text, expiry_date, parser_version FROM ocr_results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._bump("misses")
+            return None
+        self.conn.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._bump("hits")
+        text, expiry, parser_version = row
+        return text, date.fromisoformat(expiry) if expiry else None, parser_version
+
+    def put(self, key, text, expiry, parser_version):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ocr_results (key, text, expiry_date, parser_version, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, text, expiry.isoformat() if expiry else None, parser_version, now, now),
+        )
+        self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM ocr_results WHERE key IN "
+                "(SELECT key FROM ocr_results ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self._bump("evictions", overflow)
+
+    def _bump(self, name, amount=1):
+        self.conn.execute(
+            "INSERT INTO ocr_counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def stats(self):
+        counters = dict(self.conn.execute("SELECT name, value FROM ocr_counters").fetchall())
+        entries = self.conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def clear(self):
+        self.conn.execute("DELETE FROM ocr_results")
+        self.conn.execute("DELETE FROM ocr_counters")
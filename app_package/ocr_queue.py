@@ -0,0 +1,186 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from app_package import db, metrics
+from app_package.bulk_upload import complete_bulk_job
+from app_package.models import OcrJob, BulkOcrJob
+from app_package.ocr_utils import extract_expiry_timed, ocr_kind
+from app_package.thumbnails import pregenerate_thumbnails
+
+OCR_EXTENSIONS = {"jpg", "jpeg", "png", "pdf"}
+
+
+def needs_ocr(doc):
+    return bool(doc.file_path) and doc.file_type in OCR_EXTENSIONS
+
+
+def enqueue_ocr(doc):
+    """Queue an OCR job for ``doc``. The caller commits it together with the document."""
+    job = OcrJob(document=doc, status="pending")
+    db.session.add(job)
+    return job
+
+
+# Job tables the worker drains, in priority order: a user waiting on one
+# uploaded document goes ahead of the files of a bulk-upload archive
+JOB_MODELS = (OcrJob, BulkOcrJob)
+
+
+def recover_stale_jobs(timeout_seconds):
+    """Put jobs left ``running`` by a crashed or restarted worker back on the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    recovered = 0
+    for model in JOB_MODELS:
+        result = db.session.execute(
+            db.update(model)
+            .where(model.status == "running", model.started_at < cutoff)
+            .values(status="pending")
+        )
+        recovered += result.rowcount
+    db.session.commit()
+    return recovered
+
+
+def claim_jobs(limit, exclude=(), model=OcrJob):
+    """Atomically move up to ``limit`` pending ``model`` jobs to ``running`` and return them.
+
+    The conditional UPDATE makes claiming safe when several workers poll the
+    same table: only the worker whose update hits the row owns the job.
+    Jobs with ids in ``exclude`` are left for a later drain.
+    """
+    query = db.select(model.id).where(model.status == "pending")
+    if exclude:
+        query = query.where(model.id.not_in(exclude))
+    candidate_ids = db.session.execute(query.order_by(model.id).limit(limit)).scalars().all()
+
+    claimed = []
+    now = datetime.utcnow()
+    for job_id in candidate_ids:
+        result = db.session.execute(
+            db.update(model)
+            .where(model.id == job_id, model.status == "pending")
+            .values(status="running", started_at=now, attempts=model.attempts + 1)
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return db.session.execute(
+        db.select(model).where(model.id.in_(claimed)).order_by(model.id)
+    ).scalars().all()
+
+
+def complete_job(job, ocr_date):
+    """Record a finished OCR run on the job and its document."""
+    doc = job.document
+    if ocr_date:
+        doc.ocr_extracted_date = ocr_date.strftime("%d/%m/%Y")
+        # Only fill the expiry if the user did not enter one manually
+        if not doc.expiry_date:
+            doc.expiry_date = ocr_date
+    job.status = "done"
+    job.error = None
+    job.finished_at = datetime.utcnow()
+
+
+def fail_job(job, error, max_attempts):
+    job.error = str(error)
+    if job.attempts >= max_attempts:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = "pending"
+
+
+def drain_ocr_queue(app, executor=None, batch_size=None):
+    """Process pending OCR jobs until the queue is empty.
+
+    Tesseract runs in ``executor`` (a process pool); this process only claims
+    jobs and writes results back. Uploaded documents are processed before
+    bulk-upload files (see ``JOB_MODELS``). A job that fails goes back to
+    ``pending`` until it has used ``OCR_MAX_ATTEMPTS``, and is retried on a
+    later drain rather than straight away. Returns the number of jobs processed.
+    """
+    with app.app_context():
+        config = app.config
+        batch_size = batch_size or config["OCR_BATCH_SIZE"]
+        upload_folder = config["UPLOAD_FOLDER"]
+
+        own_executor = None
+        processed = 0
+        failed = {model: set() for model in JOB_MODELS}
+        try:
+            recover_stale_jobs(config["OCR_JOB_TIMEOUT"])
+            while True:
+                for model in JOB_MODELS:
+                    jobs = claim_jobs(batch_size, exclude=failed[model], model=model)
+                    if jobs:
+                        break
+                else:
+                    break
+                if executor is None:
+                    # Only spin up worker processes once there is work to do
+                    executor = own_executor = ProcessPoolExecutor(max_workers=config["OCR_WORKER_PROCESSES"])
+
+                futures, thumbnail_futures = {}, {}
+                for job in jobs:
+                    file_path = job.document.file_path if model is OcrJob else job.staged_path
+                    future = executor.submit(extract_expiry_timed, os.path.join(upload_folder, file_path))
+                    futures[future] = job, file_path
+                    if model is OcrJob:
+                        # Previews for the document page, rendered while the user waits on OCR
+                        future = executor.submit(pregenerate_thumbnails, upload_folder, file_path,
+                                                 config["THUMBNAIL_PREGENERATE"],
+                                                 config["THUMBNAIL_CACHE_MAX_BYTES"])
+                        thumbnail_futures[future] = file_path
+
+                for future in as_completed(futures):
+                    job, file_path = futures[future]
+                    try:
+                        ocr_date, ocr_text, seconds = future.result()
+                    except Exception as e:
+                        failed[model].add(job.id)
+                        fail_job(job, e, config["OCR_MAX_ATTEMPTS"])
+                        print(f"[OCR] Job {job.id} for {file_path} failed: {e}")
+                    else:
+                        metrics.OCR_SECONDS.observe(seconds, kind=ocr_kind(file_path))
+                        if model is OcrJob:
+                            complete_job(job, ocr_date)
+                        else:
+                            complete_bulk_job(job, ocr_date, ocr_text)
+                    db.session.commit()
+                    processed += 1
+
+                for future in as_completed(thumbnail_futures):
+                    if future.exception() is not None:
+                        print(f"[Thumbnail] Pregenerating {thumbnail_futures[future]} failed: {future.exception()}")
+        finally:
+            if own_executor:
+                own_executor.shutdown()
+        return processed
+
+
+def run_worker(app, processes, poll_interval):
+    """Long-running OCR worker: drain the queue, sleep, repeat."""
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        print(f"[OCR] Worker started with {processes} processes")
+        while True:
+            processed = drain_ocr_queue(app, executor=executor)
+            if processed:
+                print(f"[OCR] Processed {processed} jobs")
+            time.sleep(poll_interval)
+
+
+def job_status(doc):
+    """JSON-friendly OCR status for the document view page."""
+    job = doc.ocr_job
+    return {
+        "status": job.status if job else "none",
+        "error": job.error if job else None,
+        "ocr_extracted_date": doc.ocr_extracted_date,
+        "expiry_date": doc.expiry_date.isoformat() if doc.expiry_date else None,
+    }
+
@@ -1,25 +1,84 @@
 import re
-from datetime import datetime
+import sqlite3
+import time
+from datetime import date
 
 import os
 
-try:
-    import pytesseract
-    from PIL import Image
-    # Auto-detect Tesseract on Windows if not in PATH
-    if os.name == "nt":
-        default_path = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-        if os.path.exists(default_path):
-            pytesseract.pytesseract.tesseract_cmd = default_path
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-
-
-DATE_PATTERNS = [
-    r'\d{2}[/\-\.]\d{2}[/\-\.]\d{4}',  # DD/MM/YYYY, DD-MM-YYYY, DD.MM.YYYY
-    r'\d{4}[/\-\.]\d{2}[/\-\.]\d{2}',  # YYYY/MM/DD, YYYY-MM-DD
-]
+from app_package import metrics
+from app_package.ocr_cache import OcrCache
+
+# The OCR stack is imported on first use: it is a large part of a web worker's
+# import time and most requests never run OCR. load_ocr_stack() sets these.
+pytesseract = Image = PdfReader = convert_from_path = pdfinfo_from_path = None
+OCR_AVAILABLE = PDF_TEXT_AVAILABLE = PDF_RASTER_AVAILABLE = False
+_ocr_stack_loaded = False
+
+
+def load_ocr_stack():
+    """Import tesseract, Pillow, pypdf and pdf2image if not done yet."""
+    global pytesseract, Image, PdfReader, convert_from_path, pdfinfo_from_path
+    global OCR_AVAILABLE, PDF_TEXT_AVAILABLE, PDF_RASTER_AVAILABLE, _ocr_stack_loaded
+    if _ocr_stack_loaded:
+        return
+    try:
+        import pytesseract
+        from PIL import Image
+        # Auto-detect Tesseract on Windows if not in PATH
+        if os.name == "nt":
+            default_path = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+            if os.path.exists(default_path):
+                pytesseract.pytesseract.tesseract_cmd = default_path
+        OCR_AVAILABLE = True
+    except ImportError:
+        OCR_AVAILABLE = False
+
+    try:
+        from pypdf import PdfReader
+        PDF_TEXT_AVAILABLE = True
+    except ImportError:
+        PDF_TEXT_AVAILABLE = False
+
+    try:
+        from pdf2image import convert_from_path, pdfinfo_from_path
+        PDF_RASTER_AVAILABLE = True
+    except ImportError:
+        PDF_RASTER_AVAILABLE = False
+    _ocr_stack_loaded = True
+
+
+# Passed to tesseract and folded into the cache key
+TESSERACT_CONFIG = ""
+
+# PDF handling: a text layer shorter than this is treated as a scanned PDF
+PDF_MIN_TEXT_CHARS = 20
+PDF_OCR_DPI = 200
+PDF_MAX_OCR_PAGES = 30
+
+# Bump when the date extraction logic changes so cached dates are re-derived
+PARSER_VERSION = 3
+
+_cache = None
+_tesseract_version = None
+
+
+def configure_cache(path, max_entries):
+    """Enable the persistent OCR cache (``path=None`` disables it)."""
+    global _cache
+    _cache = OcrCache(path, max_entries) if path else None
+
+
+def get_cache():
+    return _cache
+
+
+def tesseract_version():
+    global _tesseract_version
+    if _tesseract_version is None:
+        load_ocr_stack()
+        _tesseract_version = str(pytesseract.get_tesseract_version())
+    return _tesseract_version
+
 
 EXPIRY_KEYWORDS = [
     "valid", "expiry", "upto", "up to", "till", "valid till",
@@ -27,72 +86,294 @@ EXPIRY_KEYWORDS = [
     "expires on", "valid until", "validity",
 ]
 
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+# Keywords containing another keyword ("valid upto" contains "valid") add
+# nothing to a substring search
+KEYWORD_ROOTS = [
+    kw for kw in EXPIRY_KEYWORDS
+    if not any(other != kw and other in kw for other in EXPIRY_KEYWORDS)
+]
+
+_MONTH_NAME = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)(?![a-z])\.?"
+)
+
+# Matched against lowercased text. Every form starts at its first digit, so
+# the regex engine skips prose quickly, and the groups that matched say which
+# form was found, so dates are built without trial-and-error strptime calls.
+DATE_RE = re.compile(
+    r"(?P<lead>[0-9](?<![0-9]{2})[0-9]{0,3})"  # 1-4 digit number not inside a longer one
+    r"(?:"
+    # DD/MM/YYYY or YYYY-MM-DD; OCR often misreads one separator, so they need not agree
+    r"(?P<sep>[/\-.])(?P<mid>[0-9]{2})[/\-.](?P<tail>[0-9]{4}|[0-9]{2})"
+    # 12 mar 2027, 12-mar-2027, 12th march, 2027
+    r"|(?:st|nd|rd|th)?[\s\-/.,]*(?P<month>" + _MONTH_NAME + r")[\s\-/.,]*(?P<month_year>[0-9]{4})"
+    # 12, 2027 -- completed by a month name just before it (march 12, 2027)
+    r"|(?:st|nd|rd|th)?,?\s+(?P<year>[0-9]{4})"
+    r")(?![0-9])"
+)
+
+# Month name immediately before a DATE_RE "day, year" match
+MONTH_BEFORE_RE = re.compile(r"(?<![a-z])(?P<month>" + _MONTH_NAME + r")[\s\-/.,]*$")
+
+
+def _match_to_date(text, match):
+    """Build a date from a DATE_RE match, or None if it is not a valid date."""
+    lead = match.group("lead")
+    try:
+        if match.group("sep"):
+            tail = match.group("tail")
+            if len(lead) == 2 and len(tail) == 4:
+                return date(int(tail), int(match.group("mid")), int(lead))
+            if len(lead) == 4 and len(tail) == 2:
+                return date(int(lead), int(match.group("mid")), int(tail))
+            return None
+        if len(lead) > 2:
+            return None
+        if match.group("month"):
+            return date(int(match.group("month_year")), MONTHS[match.group("month")[:3]], int(lead))
+        before = MONTH_BEFORE_RE.search(text, max(0, match.start() - 12), match.start())
+        if not before:
+            return None
+        return date(int(match.group("year")), MONTHS[before.group("month")[:3]], int(lead))
+    except ValueError:
+        return None
+
+
+def _iter_dates(lower_text, pos=0, endpos=None):
+    """Yield valid dates found in ``lower_text[pos:endpos]``."""
+    if endpos is None:
+        endpos = len(lower_text)
+    for match in DATE_RE.finditer(lower_text, pos, endpos):
+        parsed = _match_to_date(lower_text, match)
+        if parsed:
+            yield parsed
+
+
+def _keyword_lines(lower_text):
+    """Return sorted ``(start, end)`` bounds of the lines containing an expiry keyword."""
+    lines = set()
+    for kw in KEYWORD_ROOTS:
+        pos = lower_text.find(kw)
+        while pos != -1:
+            line_start = lower_text.rfind("\n", 0, pos) + 1
+            line_end = lower_text.find("\n", pos)
+            if line_end == -1:
+                line_end = len(lower_text)
+            lines.add((line_start, line_end))
+            pos = lower_text.find(kw, line_end)
+    return sorted(lines)
+
+
+def _latest_keyword_date(lower_text):
+    best_date = None
+    for line_start, line_end in _keyword_lines(lower_text):
+        for parsed in _iter_dates(lower_text, line_start, line_end):
+            if best_date is None or parsed > best_date:
+                best_date = parsed
+    return best_date
+
 
 def extract_dates_from_text(text):
-    """Extract all date strings from OCR text."""
-    dates = []
-    for pattern in DATE_PATTERNS:
-        matches = re.findall(pattern, text)
-        dates.extend(matches)
-    return dates
-
-
-def parse_date(date_str):
-    """Try to parse a date string into a date object."""
-    formats = [
-        "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y",
-        "%Y/%m/%d", "%Y-%m-%d",
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            continue
-    return None
+    """Extract all valid dates from OCR text, in order of appearance."""
+    return list(_iter_dates(text.lower()))
+
+
+def find_keyword_expiry_date(text):
+    """Return the latest date on a line containing an expiry keyword, or None."""
+    return _latest_keyword_date(text.lower())
 
 
 def find_expiry_date_from_text(text):
-    """Find the most likely expiry date from OCR text by looking near expiry keywords."""
-    text_lower = text.lower()
-    lines = text.split("\n")
+    """Find the most likely expiry date from OCR text by looking near expiry keywords.
 
-    # First pass: look for dates on lines containing expiry keywords
-    best_date = None
-    for line in lines:
-        line_lower = line.lower()
-        has_keyword = any(kw in line_lower for kw in EXPIRY_KEYWORDS)
-        if has_keyword:
-            dates = extract_dates_from_text(line)
-            for d in dates:
-                parsed = parse_date(d)
-                if parsed:
-                    if best_date is None or parsed > best_date:
-                        best_date = parsed
-
-    # If found near keywords, return it
+    The text is lowercased once; keyword lines are located with substring
+    search and only those lines are scanned for dates. The whole text is
+    scanned only when no keyword line carries a date, in which case the
+    latest date is assumed to be the expiry. A single keyword-and-date
+    pattern would be one regex pass too, but CPython's re cannot skip ahead
+    to a digit with one and ran it several times slower.
+    """
+    lower_text = text.lower()
+    best_date = _latest_keyword_date(lower_text)
     if best_date:
         return best_date
+    return max(_iter_dates(lower_text), default=None)
+
+
+def _cache_lookup(file_path):
+    """Return ``(key, cached_result)``; cache problems never block OCR."""
+    if _cache is None:
+        return None, None
+    try:
+        key = OcrCache.make_key(file_path, tesseract_version(), TESSERACT_CONFIG)
+        cached = _cache.get(key)
+    except sqlite3.Error as e:
+        print(f"[OCR] Cache lookup failed: {e}")
+        return None, None
+    if cached is None:
+        return key, None
+
+    text, expiry, parser_version = cached
+    if parser_version != PARSER_VERSION:
+        expiry = find_expiry_date_from_text(text)
+        _cache_store(key, text, expiry)
+    return key, (expiry, text)
 
-    # Second pass: return the latest date found (likely the expiry)
-    all_dates = extract_dates_from_text(text)
-    parsed_dates = [parse_date(d) for d in all_dates]
-    valid_dates = [d for d in parsed_dates if d is not None]
 
-    if valid_dates:
-        return max(valid_dates)
+def _cache_store(key, text, expiry):
+    try:
+        _cache.put(key, text, expiry, PARSER_VERSION)
+    except sqlite3.Error as e:
+        print(f"[OCR] Cache store failed: {e}")
 
-    return None
 
+class OcrError(RuntimeError):
+    """Expiry extraction could not run on a file (unreadable file, OCR tools missing)."""
 
-def extract_expiry_from_image(file_path):
-    """Run OCR on an image and try to extract the expiry date."""
+
+def _read_image(file_path):
+    """Return ``(expiry, text)`` from an image; raises when OCR cannot run."""
+    load_ocr_stack()
     if not OCR_AVAILABLE:
-        return None, "OCR libraries not available"
+        raise OcrError("OCR libraries not available")
+
+    key, cached = _cache_lookup(file_path)
+    if cached:
+        return cached
+
+    with Image.open(file_path) as image:
+        text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+    expiry = find_expiry_date_from_text(text)
+    if key:
+        _cache_store(key, text, expiry)
+    return expiry, text
+
+
+def extract_expiry_from_image(file_path):
+    """Run OCR on an image and try to extract the expiry date.
 
+    Results are cached on the file's content hash, so re-uploading the same
+    scan skips tesseract entirely. On failure returns ``(None, error message)``.
+    """
     try:
-        image = Image.open(file_path)
-        text = pytesseract.image_to_string(image)
-        expiry = find_expiry_date_from_text(text)
-        return expiry, text
+        return _read_image(file_path)
     except Exception as e:
         return None, str(e)
+
+
+def _pdf_text_layer(file_path):
+    """Extract the embedded text page by page, stopping at a keyword-anchored date.
+
+    Returns ``(expiry, text)``; ``text`` is empty when the PDF has no usable
+    text layer (i.e. it is a scan).
+    """
+    reader = PdfReader(file_path)
+    pages = []
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        pages.append(page_text)
+        expiry = find_keyword_expiry_date(page_text)
+        if expiry:
+            return expiry, "\n".join(pages)
+
+    text = "\n".join(pages)
+    if len("".join(text.split())) < PDF_MIN_TEXT_CHARS:
+        return None, ""
+    return find_expiry_date_from_text(text), text
+
+
+def _ocr_pdf_pages(file_path):
+    """Rasterize and OCR one page at a time until a keyword-anchored date turns up."""
+    page_count = min(pdfinfo_from_path(file_path)["Pages"], PDF_MAX_OCR_PAGES)
+    pages = []
+    for page_no in range(1, page_count + 1):
+        image = convert_from_path(file_path, dpi=PDF_OCR_DPI, first_page=page_no, last_page=page_no)[0]
+        try:
+            page_text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+        finally:
+            image.close()
+        pages.append(page_text)
+        expiry = find_keyword_expiry_date(page_text)
+        if expiry:
+            return expiry, "\n".join(pages)
+
+    text = "\n".join(pages)
+    return find_expiry_date_from_text(text), text
+
+
+def _read_pdf(file_path):
+    """Return ``(expiry, text)`` from a PDF; raises when it cannot be read."""
+    load_ocr_stack()
+    if PDF_TEXT_AVAILABLE:
+        expiry, text = _pdf_text_layer(file_path)
+        if text:
+            return expiry, text
+
+    if not (OCR_AVAILABLE and PDF_RASTER_AVAILABLE):
+        raise OcrError("PDF OCR libraries not available")
+
+    key, cached = _cache_lookup(file_path)
+    if cached:
+        return cached
+
+    expiry, text = _ocr_pdf_pages(file_path)
+    if key:
+        _cache_store(key, text, expiry)
+    return expiry, text
+
+
+def extract_expiry_from_pdf(file_path):
+    """Find the expiry date in a PDF.
+
+    Insurer-issued PDFs usually carry a text layer, which is read directly.
+    Scanned PDFs fall back to OCR, rasterizing a single page at a time so
+    long policies are neither fully rendered nor held in memory at once.
+    On failure returns ``(None, error message)``.
+    """
+    try:
+        return _read_pdf(file_path)
+    except Exception as e:
+        return None, str(e)
+
+
+def ocr_kind(file_path):
+    return "pdf" if file_path.lower().endswith(".pdf") else "image"
+
+
+def extract_expiry_from_file(file_path):
+    """Extract the expiry date from an uploaded image or PDF.
+
+    On failure returns ``(None, error message)``.
+    """
+    try:
+        expiry, text, seconds = extract_expiry_timed(file_path)
+    except OcrError as e:
+        return None, str(e)
+    metrics.OCR_SECONDS.observe(seconds, kind=ocr_kind(file_path))
+    return expiry, text
+
+
+def extract_expiry_timed(file_path):
+    """Return ``(expiry, text, seconds)`` for a file, raising ``OcrError`` on failure.
+
+    Meant for process pools: the duration is returned, not recorded, so the
+    caller observes it in its own metrics exactly once.
+    """
+    started = time.perf_counter()
+    try:
+        if ocr_kind(file_path) == "pdf":
+            expiry, text = _read_pdf(file_path)
+        else:
+            expiry, text = _read_image(file_path)
+    except OcrError:
+        raise
+    except Exception as e:
+        # Re-raised as OcrError so it always pickles back from a worker process
+        raise OcrError(f"{type(e).__name__}: {e}") from None
+    return expiry, text, time.perf_counter() - started
@@ -0,0 +1,94 @@
+"""Read-replica routing.
+
+With ``REPLICA_DATABASE_URL`` set, the replica is registered as the
+``replica`` bind and ``RoutingSession`` sends SELECTs to it while a view
+decorated with ``@read_replica`` runs, unless that request has already
+written, or the same browser session wrote within the last
+``REPLICA_STICKY_SECONDS`` (so the page after a form post sees its own
+change despite replication lag). Everything else, including all writes,
+uses the primary. Background jobs opt in per query with
+``replica_bind_arguments()``.
+"""
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = "replica"
+STICKY_KEY = "_db_primary_until"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get("read_replica") and not self._flushing
+                and isinstance(clause, Select) and REPLICA_BIND in self._db.engines):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_binds(config, engine_options):
+    """``SQLALCHEMY_BINDS`` entry for the replica, or {} when none is configured."""
+    url = config["REPLICA_DATABASE_URL"]
+    if not url:
+        return {}
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return {REPLICA_BIND: dict(engine_options, url=url)}
+
+
+def read_replica(view):
+    """Let ``view``'s queries read from the replica (see module docstring)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app_package import db
+
+        if session.get(STICKY_KEY, 0) < time.time():
+            db.session.info["read_replica"] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.session.info.pop("read_replica", None)
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """Send the enclosed queries to the primary, even inside a ``@read_replica`` view."""
+    from app_package import db
+
+    routed = db.session.info.pop("read_replica", None)
+    try:
+        yield
+    finally:
+        if routed and not db.session.info.get("wrote"):
+            db.session.info["read_replica"] = routed
+
+
+def replica_bind_arguments():
+    """``bind_arguments`` that run one query on the replica when there is one."""
+    from app_package import db
+
+    engine = db.engines.get(REPLICA_BIND)
+    return {"bind": engine} if engine is not None else {}
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stay_on_primary(session_, flush_context):
+    # Whatever this request reads next must see what it just wrote
+    session_.info.pop("read_replica", None)
+    session_.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session_):
+    if (session_.info.pop("wrote", False) and has_request_context()
+            and current_app.config["REPLICA_DATABASE_URL"]):
+        session[STICKY_KEY] = time.time() + current_app.config["REPLICA_STICKY_SECONDS"]
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_writes(session_):
+    session_.info.pop("wrote", None)
@@ -1,37 +1,88 @@
-from datetime import date, timedelta
-from flask import Blueprint, render_template
+from datetime import date, datetime, time, timedelta
+from flask import Blueprint, render_template, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import contains_eager
 from app_package import db
+from app_package.cache import cached, dashboard_key
 from app_package.models import Vehicle, Document
+from app_package.replica import read_replica
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 
-@dashboard_bp.route("/")
-@login_required
-def index():
-    vehicles = db.session.query(Vehicle).filter_by(user_id=current_user.id, is_active=True).all()
-    vehicle_ids = [v.id for v in vehicles]
+def _alert_row(doc, today):
+    """Plain-data copy of an alert row, so it can be cached outside the session."""
+    vehicle = doc.vehicle
+    return {
+        "id": doc.id,
+        "doc_type_label": doc.doc_type_label,
+        "expiry_date": doc.expiry_date,
+        "days_remaining": (doc.expiry_date - today).days,
+        "vehicle": {"registration_number": vehicle.registration_number, "make": vehicle.make, "model": vehicle.model},
+    }
+
 
-    documents = db.session.query(Document).filter(
-        Document.vehicle_id.in_(vehicle_ids),
+def dashboard_data(user_id, today):
+    """Counters and alert rows for ``user_id``'s dashboard as of ``today``."""
+    soon = today + timedelta(days=30)
+    window_end = today + timedelta(days=current_app.config["DASHBOARD_ALERT_WINDOW_DAYS"])
+
+    tracked_docs = (
+        Vehicle.user_id == user_id,
+        Vehicle.is_active.is_(True),
         Document.status == "active",
         Document.expiry_date.isnot(None),
-    ).order_by(Document.expiry_date.asc()).all()
+    )
+
+    # All four counters in one aggregate query
+    vehicle_count = db.select(db.func.count(Vehicle.id)).where(
+        Vehicle.user_id == user_id, Vehicle.is_active.is_(True)
+    ).scalar_subquery()
+    counts = db.session.execute(
+        db.select(
+            vehicle_count.label("total_vehicles"),
+            db.func.count(Document.id).label("total_docs"),
+            db.func.count(db.case((Document.expiry_date < today, 1))).label("expired"),
+            db.func.count(db.case((Document.expiry_date.between(today, soon), 1))).label("expiring_soon"),
+        )
+        .select_from(Document)
+        .join(Document.vehicle)
+        .where(*tracked_docs)
+    ).one()
 
+    # Only the actionable rows, with their vehicle loaded in the same query
+    documents = db.session.execute(
+        db.select(Document)
+        .join(Document.vehicle)
+        .options(contains_eager(Document.vehicle))
+        .where(*tracked_docs, Document.expiry_date <= window_end)
+        .order_by(Document.expiry_date.asc(), Document.id.asc())
+        .limit(current_app.config["DASHBOARD_ALERT_LIMIT"])
+    ).scalars().all()
+
+    return {
+        "documents": [_alert_row(doc, today) for doc in documents],
+        "total_vehicles": counts.total_vehicles,
+        "total_docs": counts.total_docs,
+        "expired_count": counts.expired,
+        "expiring_soon_count": counts.expiring_soon,
+    }
+
+
+@dashboard_bp.route("/")
+@read_replica
+@login_required
+def index():
     today = date.today()
-    total_vehicles = len(vehicles)
-    total_docs = len(documents)
-    expired = [d for d in documents if d.expiry_date < today]
-    expiring_soon = [d for d in documents if 0 <= (d.expiry_date - today).days <= 30]
+    # Cached until the user's data changes, and never past midnight
+    until_midnight = (datetime.combine(today + timedelta(days=1), time.min) - datetime.now()).total_seconds()
+    ttl = min(current_app.config["DASHBOARD_CACHE_TTL"], until_midnight)
+    data = cached("dashboard", dashboard_key(current_user.id, today), ttl,
+                  lambda: dashboard_data(current_user.id, today))
 
     return render_template(
         "dashboard.html",
-        vehicles=vehicles,
-        documents=documents,
-        total_vehicles=total_vehicles,
-        total_docs=total_docs,
-        expired_count=len(expired),
-        expiring_soon_count=len(expiring_soon),
+        alert_window_days=current_app.config["DASHBOARD_ALERT_WINDOW_DAYS"],
         today=today,
+        **data,
     )
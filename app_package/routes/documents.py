@@ -1,11 +1,21 @@
+import mimetypes
 import os
-import uuid
-from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_from_directory
+import shutil
+import time
+from datetime import date, datetime, timedelta
+from flask import (Blueprint, Response, render_template, redirect, url_for, flash, request, current_app,
+                   send_from_directory, jsonify, abort, stream_with_context)
+from werkzeug.security import safe_join
+from itsdangerous import BadSignature, URLSafeSerializer
 from flask_login import login_required, current_user
+from sqlalchemy.orm import contains_eager
 from app_package import db
+from app_package.identity import active_vehicles, owns_vehicle
 from app_package.models import Vehicle, Document
-from app_package.ocr_utils import extract_expiry_from_image
+from app_package.replica import read_replica
+from app_package.ocr_queue import enqueue_ocr, needs_ocr, job_status
+from app_package import bulk_upload, export, storage
+from app_package.thumbnails import get_thumbnail, pdf_previews_available, thumbnail_etag
 
 documents_bp = Blueprint("documents", __name__, url_prefix="/documents")
 
@@ -16,26 +26,147 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+URGENCY_BUCKETS = ["expired", "warning", "valid", "unknown"]
+DOC_STATUSES = ["active", "expired", "renewed"]
+
+
+def parse_document_filters(args):
+    """Read the listing filters from a request's query string, dropping invalid values."""
+    filters = {
+        "vehicle_id": args.get("vehicle_id", type=int),
+        "doc_type": args.get("doc_type"),
+        "status": args.get("status"),
+        "urgency": args.get("urgency"),
+    }
+    if filters["doc_type"] not in Document.DOC_TYPES:
+        filters["doc_type"] = None
+    if filters["status"] not in DOC_STATUSES:
+        filters["status"] = None
+    if filters["urgency"] not in URGENCY_BUCKETS:
+        filters["urgency"] = None
+    return {key: value for key, value in filters.items() if value}
+
+
+def document_filter_clauses(user_id, filters, today=None):
+    """WHERE clauses for a user's documents (joined to Vehicle) matching ``filters``."""
+    today = today or date.today()
+    soon = today + timedelta(days=30)
+    clauses = [Vehicle.user_id == user_id, Vehicle.is_active.is_(True)]
+
+    if filters.get("vehicle_id"):
+        clauses.append(Document.vehicle_id == filters["vehicle_id"])
+    if filters.get("doc_type"):
+        clauses.append(Document.doc_type == filters["doc_type"])
+    if filters.get("status"):
+        clauses.append(Document.status == filters["status"])
+
+    # Same buckets as Document.urgency
+    urgency = filters.get("urgency")
+    if urgency == "expired":
+        clauses.append(Document.expiry_date < today)
+    elif urgency == "warning":
+        clauses.append(Document.expiry_date.between(today, soon))
+    elif urgency == "valid":
+        clauses.append(Document.expiry_date > soon)
+    elif urgency == "unknown":
+        clauses.append(Document.expiry_date.is_(None))
+    return clauses
+
+
+def _cursor_serializer():
+    return URLSafeSerializer(current_app.secret_key, salt="documents.cursor")
+
+
+def encode_cursor(doc):
+    """Signed ``(expiry_date, id)`` of the last row on a page."""
+    return _cursor_serializer().dumps([doc.expiry_date.isoformat() if doc.expiry_date else None, doc.id])
+
+
+def decode_cursor(cursor):
+    """Return ``(expiry_date or None, id)``, or None for a malformed or tampered cursor."""
+    try:
+        expiry, doc_id = _cursor_serializer().loads(cursor)
+        if not isinstance(doc_id, int) or isinstance(doc_id, bool):
+            return None
+        return (date.fromisoformat(expiry) if expiry is not None else None), doc_id
+    except (BadSignature, TypeError, ValueError):
+        return None
+
+
+def after_cursor(cursor):
+    """Keyset condition for rows after ``cursor`` in (expiry_date NULLS LAST, id) order."""
+    expiry, doc_id = cursor
+    if expiry is None:
+        return db.and_(Document.expiry_date.is_(None), Document.id > doc_id)
+    return db.or_(
+        Document.expiry_date > expiry,
+        db.and_(Document.expiry_date == expiry, Document.id > doc_id),
+        Document.expiry_date.is_(None),
+    )
+
+
 @documents_bp.route("/")
+@read_replica
 @login_required
 def list_documents():
-    vehicle_id = request.args.get("vehicle_id", type=int)
-    vehicles = db.session.query(Vehicle).filter_by(user_id=current_user.id, is_active=True).all()
-    vehicle_ids = [v.id for v in vehicles]
-
-    query = db.session.query(Document).filter(Document.vehicle_id.in_(vehicle_ids))
-    if vehicle_id:
-        query = query.filter(Document.vehicle_id == vehicle_id)
+    filters = parse_document_filters(request.args)
+    cursor = None
+    if request.args.get("cursor"):
+        cursor = decode_cursor(request.args["cursor"])
+        if cursor is None:
+            abort(400, "Invalid page cursor.")
+    page_size = current_app.config["DOCUMENTS_PAGE_SIZE"]
+
+    vehicles = active_vehicles(current_user.id)
+    clauses = document_filter_clauses(current_user.id, filters)
+
+    total = db.session.scalar(
+        db.select(db.func.count(Document.id)).join(Document.vehicle).where(*clauses)
+    )
+
+    query = (
+        db.select(Document)
+        .join(Document.vehicle)
+        .options(contains_eager(Document.vehicle))
+        .where(*clauses)
+    )
+    if cursor:
+        query = query.where(after_cursor(cursor))
+    # Fetch one extra row to learn whether there is a next page
+    documents = db.session.execute(
+        query.order_by(Document.expiry_date.asc().nulls_last(), Document.id.asc()).limit(page_size + 1)
+    ).scalars().all()
+
+    next_cursor = None
+    if len(documents) > page_size:
+        documents = documents[:page_size]
+        next_cursor = encode_cursor(documents[-1])
 
-    documents = query.order_by(Document.expiry_date.asc()).all()
     return render_template("documents/list.html", documents=documents, vehicles=vehicles,
-                           selected_vehicle_id=vehicle_id)
+                           filters=filters, total=total, next_cursor=next_cursor,
+                           is_first_page=cursor is None, selected_vehicle_id=filters.get("vehicle_id"),
+                           doc_types=Document.DOC_TYPES, doc_type_labels=Document.DOC_TYPE_LABELS,
+                           doc_statuses=DOC_STATUSES, urgency_buckets=URGENCY_BUCKETS)
+
+
+@documents_bp.route("/export.<any(csv, xlsx):fmt>")
+@read_replica
+@login_required
+def export_documents(fmt):
+    """Download every document matching the listing filters as a streamed CSV or XLSX file."""
+    filters = parse_document_filters(request.args)
+    batches = export.export_batches(current_user.id, document_filter_clauses(current_user.id, filters),
+                                    current_app.config["EXPORT_BATCH_SIZE"])
+    body = export.stream_csv(batches) if fmt == "csv" else export.stream_xlsx(batches)
+    filename = f"documents-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(body), mimetype=export.EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 
 @documents_bp.route("/upload", methods=["GET", "POST"])
 @login_required
 def upload():
-    vehicles = db.session.query(Vehicle).filter_by(user_id=current_user.id, is_active=True).all()
+    vehicles = active_vehicles(current_user.id)
 
     if request.method == "POST":
         vehicle_id = request.form.get("vehicle_id", type=int)
@@ -43,8 +174,7 @@ def upload():
         file = request.files.get("file")
 
         # Validate vehicle belongs to user
-        vehicle = db.session.get(Vehicle, vehicle_id) if vehicle_id else None
-        if not vehicle or vehicle.user_id != current_user.id:
+        if not owns_vehicle(current_user.id, vehicle_id):
             flash("Invalid vehicle selected.", "danger")
             return render_template("documents/upload.html", vehicles=vehicles,
                                    doc_types=Document.DOC_TYPES, doc_type_labels=Document.DOC_TYPE_LABELS)
@@ -57,21 +187,12 @@ def upload():
         # Handle file upload
         file_path = None
         file_type = None
-        ocr_date = None
-        ocr_text = None
 
         if file and file.filename and allowed_file(file.filename):
             ext = file.filename.rsplit(".", 1)[1].lower()
-            filename = f"{uuid.uuid4().hex}.{ext}"
-            save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-            file.save(save_path)
-            file_path = filename
+            file_path = storage.save_stream(file.stream, ext, current_app.config["UPLOAD_FOLDER"])
             file_type = ext if ext != "jpeg" else "jpg"
 
-            # Run OCR on images
-            if ext in ("jpg", "jpeg", "png"):
-                ocr_date, ocr_text = extract_expiry_from_image(save_path)
-
         # Parse manual dates
         issue_date = None
         expiry_date = None
@@ -86,10 +207,6 @@ def upload():
             except ValueError:
                 pass
 
-        # Use OCR date if no manual date provided
-        if not expiry_date and ocr_date:
-            expiry_date = ocr_date
-
         doc = Document(
             vehicle_id=vehicle_id,
             doc_type=doc_type,
@@ -99,15 +216,19 @@ def upload():
             expiry_date=expiry_date,
             file_path=file_path,
             file_type=file_type,
-            ocr_extracted_date=ocr_date.strftime("%d/%m/%Y") if ocr_date else None,
             reminder_days=int(request.form.get("reminder_days", 30)),
             notes=request.form.get("notes", "").strip(),
         )
         db.session.add(doc)
+
+        # OCR runs in the background; the view page polls for the result
+        queued_ocr = needs_ocr(doc)
+        if queued_ocr:
+            enqueue_ocr(doc)
         db.session.commit()
 
-        if ocr_date:
-            flash(f"Document uploaded. OCR detected expiry date: {ocr_date.strftime('%d/%m/%Y')}. Please verify.", "info")
+        if queued_ocr:
+            flash("Document uploaded. Detecting expiry date from the scan...", "info")
         else:
             flash("Document uploaded successfully.", "success")
 
@@ -119,21 +240,144 @@ def upload():
                            preselect_vehicle=preselect_vehicle)
 
 
+@documents_bp.route("/bulk-upload", methods=["GET", "POST"])
+@login_required
+def bulk_upload_archive():
+    if request.method == "POST":
+        # Archives may be much larger than a single document upload
+        request.max_content_length = current_app.config["BULK_UPLOAD_MAX_LENGTH"]
+        doc_type = request.form.get("doc_type")
+        file = request.files.get("file")
+
+        if doc_type not in Document.DOC_TYPES:
+            flash("Invalid document type.", "danger")
+        elif not file or not file.filename or not file.filename.lower().endswith(".zip"):
+            flash("Please choose a .zip file.", "danger")
+        else:
+            upload_folder = current_app.config["UPLOAD_FOLDER"]
+            bulk_upload.cleanup_stale_batches(upload_folder)
+            try:
+                token, entries, skipped = bulk_upload.stage_archive(
+                    file.stream, upload_folder,
+                    max_files=current_app.config["BULK_UPLOAD_MAX_FILES"],
+                    max_entry_bytes=current_app.config["MAX_CONTENT_LENGTH"],
+                )
+            except bulk_upload.ArchiveError as e:
+                flash(str(e), "danger")
+            else:
+                # Only file names are matched here; the OCR worker reads the scans
+                bulk_upload.match_filenames(entries, bulk_upload.vehicles_by_registration(current_user.id))
+                bulk_upload.write_manifest(
+                    bulk_upload.staging_dir(upload_folder, token),
+                    bulk_upload.new_manifest(current_user.id, doc_type, entries, skipped),
+                )
+                bulk_upload.enqueue_bulk_ocr(current_user.id, token, entries)
+                db.session.commit()
+                return redirect(url_for("documents.bulk_review", token=token))
+
+    return render_template("documents/bulk_upload.html",
+                           doc_types=Document.DOC_TYPES, doc_type_labels=Document.DOC_TYPE_LABELS)
+
+
+@documents_bp.route("/bulk-upload/<token>", methods=["GET", "POST"])
+@login_required
+def bulk_review(token):
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    try:
+        target, manifest = bulk_upload.read_manifest(upload_folder, token, current_user.id)
+    except bulk_upload.ArchiveError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("documents.bulk_upload_archive"))
+
+    vehicles = active_vehicles(current_user.id)
+    progress = bulk_upload.bulk_progress(token)
+    # Proposals are hints: show whatever has been scanned so far
+    bulk_upload.apply_bulk_results(manifest, token)
+
+    if request.method == "POST":
+        if request.form.get("action") == "discard":
+            bulk_upload.cancel_bulk_jobs(token)
+            db.session.commit()
+            shutil.rmtree(target, ignore_errors=True)
+            flash("Bulk upload discarded.", "info")
+            return redirect(url_for("documents.list_documents"))
+
+        owned_ids = {v["id"] for v in vehicles}
+        rows, problems = [], 0
+        for i, entry in enumerate(manifest["entries"]):
+            if not request.form.get(f"include_{i}"):
+                continue
+            vehicle_id = request.form.get(f"vehicle_{i}", type=int)
+            doc_type = request.form.get(f"doc_type_{i}")
+            if vehicle_id not in owned_ids or doc_type not in Document.DOC_TYPES:
+                problems += 1
+                continue
+            rows.append((entry, vehicle_id, doc_type, bulk_upload.parse_iso_date(request.form.get(f"expiry_{i}"))))
+
+        if problems:
+            flash(f"{problems} selected file(s) need a vehicle and document type.", "danger")
+        elif not rows:
+            flash("Select at least one file to add.", "warning")
+        else:
+            bulk_upload.cancel_bulk_jobs(token)
+            documents = bulk_upload.create_documents(target, upload_folder, rows)
+            flash(f"Added {len(documents)} documents.", "success")
+            return redirect(url_for("documents.list_documents"))
+
+    return render_template("documents/bulk_review.html", token=token, manifest=manifest, vehicles=vehicles,
+                           progress=progress, doc_types=Document.DOC_TYPES,
+                           doc_type_labels=Document.DOC_TYPE_LABELS)
+
+
+@documents_bp.route("/bulk-upload/<token>/status")
+@login_required
+def bulk_status(token):
+    """Scanning progress of a bulk-upload batch, polled by the review page."""
+    try:
+        bulk_upload.read_manifest(current_app.config["UPLOAD_FOLDER"], token, current_user.id)
+    except bulk_upload.ArchiveError:
+        abort(404)
+    return jsonify(bulk_upload.bulk_progress(token))
+
+
 @documents_bp.route("/<int:id>")
 @login_required
 def view_document(id):
     doc = db.session.get(Document, id)
-    if not doc or doc.vehicle.user_id != current_user.id:
+    if not doc or not owns_vehicle(current_user.id, doc.vehicle_id):
         flash("Document not found.", "danger")
         return redirect(url_for("documents.list_documents"))
-    return render_template("documents/view.html", doc=doc)
+    return render_template("documents/view.html", doc=doc, pdf_preview=pdf_previews_available())
+
+
+@documents_bp.route("/<int:id>/ocr-status")
+@login_required
+def ocr_status(id):
+    doc = db.session.get(Document, id)
+    if not doc or not owns_vehicle(current_user.id, doc.vehicle_id):
+        return jsonify({"error": "Document not found."}), 404
+    return jsonify(job_status(doc))
+
+
+@documents_bp.route("/<int:id>/thumbnail/<size>")
+@login_required
+def thumbnail(id, size):
+    doc = db.session.get(Document, id)
+    if not doc or not owns_vehicle(current_user.id, doc.vehicle_id) or not doc.file_path:
+        abort(404)
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    rel = get_thumbnail(upload_folder, doc.file_path, size, current_app.config["THUMBNAIL_CACHE_MAX_BYTES"])
+    if rel is None:
+        abort(404)
+    return file_response(upload_folder, rel, etag=thumbnail_etag(doc.file_path, size),
+                         cache_max_age=current_app.config["FILE_CACHE_MAX_AGE"])
 
 
 @documents_bp.route("/<int:id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_document(id):
     doc = db.session.get(Document, id)
-    if not doc or doc.vehicle.user_id != current_user.id:
+    if not doc or not owns_vehicle(current_user.id, doc.vehicle_id):
         flash("Document not found.", "danger")
         return redirect(url_for("documents.list_documents"))
 
@@ -159,8 +403,7 @@ def edit_document(id):
         flash("Document updated.", "success")
         return redirect(url_for("documents.view_document", id=doc.id))
 
-    vehicles = db.session.query(Vehicle).filter_by(user_id=current_user.id, is_active=True).all()
-    return render_template("documents/upload.html", vehicles=vehicles,
+    return render_template("documents/upload.html", vehicles=active_vehicles(current_user.id),
                            doc_types=Document.DOC_TYPES, doc_type_labels=Document.DOC_TYPE_LABELS,
                            doc=doc, editing=True)
 
@@ -169,23 +412,69 @@ def edit_document(id):
 @login_required
 def delete_document(id):
     doc = db.session.get(Document, id)
-    if not doc or doc.vehicle.user_id != current_user.id:
+    if not doc or not owns_vehicle(current_user.id, doc.vehicle_id):
         flash("Document not found.", "danger")
         return redirect(url_for("documents.list_documents"))
 
-    # Delete uploaded file
-    if doc.file_path:
-        file_full = os.path.join(current_app.config["UPLOAD_FOLDER"], doc.file_path)
-        if os.path.exists(file_full):
-            os.remove(file_full)
-
+    # The file goes once no other document shares its content
+    storage.release(doc.file_path, current_app.config["UPLOAD_FOLDER"])
     db.session.delete(doc)
     db.session.commit()
     flash("Document deleted.", "success")
     return redirect(url_for("documents.list_documents"))
 
 
-@documents_bp.route("/file/<filename>")
+def file_response(directory, filename, etag=None, cache_max_age=None):
+    """Serve ``directory/filename`` with conditional and range request support.
+
+    ``etag`` is a strong validator for content that never changes; with it the
+    response may be cached privately for ``cache_max_age`` seconds. Otherwise
+    browsers revalidate on each use. With FILE_SERVE_MODE set, the front proxy
+    sends the bytes and the worker is freed immediately.
+    """
+    config = current_app.config
+    if config["FILE_SERVE_MODE"] == "x-accel":
+        if not os.path.isfile(safe_join(directory, filename) or ""):
+            abort(404)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        response.headers["X-Accel-Redirect"] = config["FILE_ACCEL_PREFIX"].rstrip("/") + "/" + filename
+        if etag:
+            response.set_etag(etag)
+        # nginx handles Range itself; answer If-None-Match here without touching the file
+        response.make_conditional(request)
+        if response.status_code == 304:
+            response.headers.pop("X-Accel-Redirect")
+    else:
+        # USE_X_SENDFILE (FILE_SERVE_MODE=x-sendfile) is honoured by send_file itself
+        response = send_from_directory(directory, filename, etag=etag or True, conditional=True)
+
+    if etag and cache_max_age:
+        response.cache_control.no_cache = None
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.max_age = cache_max_age
+        response.cache_control.immutable = True
+        response.expires = int(time.time() + cache_max_age)
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+
+@documents_bp.route("/file/<path:filename>")
 @login_required
 def serve_file(filename):
-    return send_from_directory(current_app.config["UPLOAD_FOLDER"], filename)
+    # One indexed lookup: does a document of this user point at the file?
+    owned = db.session.scalar(
+        db.select(Document.id)
+        .join(Document.vehicle)
+        .where(Document.file_path == filename, Vehicle.user_id == current_user.id)
+        .limit(1)
+    )
+    if owned is None:
+        abort(404)
+    return file_response(current_app.config["UPLOAD_FOLDER"], filename,
+                         etag=storage.blob_digest(filename),
+                         cache_max_age=current_app.config["FILE_CACHE_MAX_AGE"])
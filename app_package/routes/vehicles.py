@@ -1,20 +1,25 @@
+import io
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app_package import db
+from app_package.fleet_import import import_fleet_csv, VEHICLE_COLUMNS, DOCUMENT_COLUMNS
 from app_package.models import Vehicle
+from app_package.replica import read_replica
 
 vehicles_bp = Blueprint("vehicles", __name__, url_prefix="/vehicles")
 
-VEHICLE_TYPES = ["car", "bike", "truck", "bus", "auto"]
-FUEL_TYPES = ["petrol", "diesel", "cng", "electric"]
+VEHICLE_TYPES = Vehicle.VEHICLE_TYPES
+FUEL_TYPES = Vehicle.FUEL_TYPES
 
 
 @vehicles_bp.route("/")
+@read_replica
 @login_required
 def list_vehicles():
     vehicles = db.session.query(Vehicle).filter_by(
         user_id=current_user.id, is_active=True
     ).order_by(Vehicle.created_at.desc()).all()
+    Vehicle.load_expiry_summaries(vehicles)
     return render_template("vehicles/list.html", vehicles=vehicles)
 
 
@@ -46,6 +51,28 @@ def add_vehicle():
                            vehicle_types=VEHICLE_TYPES, fuel_types=FUEL_TYPES)
 
 
+@vehicles_bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_vehicles():
+    report = None
+    if request.method == "POST":
+        file = request.files.get("file")
+        if not file or not file.filename or not file.filename.lower().endswith(".csv"):
+            flash("Please choose a .csv file.", "danger")
+        else:
+            # Undecodable bytes (e.g. an Excel cp1252 export) fail their rows, not the request
+            stream = io.TextIOWrapper(file.stream, encoding="utf-8-sig", errors="replace", newline="")
+            report = import_fleet_csv(stream, current_user.id)
+            flash(
+                f"Imported {report['rows'] - report['error_count']} of {report['rows']} rows: "
+                f"{report['vehicles_created']} vehicles added, {report['vehicles_updated']} updated.",
+                "success" if not report["error_count"] else "warning",
+            )
+
+    return render_template("vehicles/import.html", report=report,
+                           vehicle_columns=VEHICLE_COLUMNS, document_columns=DOCUMENT_COLUMNS)
+
+
 @vehicles_bp.route("/edit/<int:id>", methods=["GET", "POST"])
 @login_required
 def edit_vehicle(id):
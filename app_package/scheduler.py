@@ -1,107 +1,264 @@
-from datetime import date, datetime
+from datetime import datetime, time, timedelta
+from time import perf_counter
 from apscheduler.schedulers.background import BackgroundScheduler
-from flask_mail import Message
-from app_package import db, mail
-from app_package.models import User, Vehicle, Document, ReminderLog
+from apscheduler.schedulers.blocking import BlockingScheduler
+from sqlalchemy import insert
+from sqlalchemy.orm import contains_eager
+from app_package import db, metrics
+from app_package.mailer import deliver_outbox
+from app_package.metrics import count_queries
+from app_package.models import User, Vehicle, Document, ReminderLog, OutboxMessage
+from app_package.replica import replica_bind_arguments
 
 
-def check_expiry_and_send_reminders(app):
-    """Daily job: find expiring documents and send email reminders."""
+def find_due_documents(now, user_range=None):
+    """Return ``(due, doc_ids)`` for documents whose ``next_reminder_at`` has passed.
+
+    ``due`` maps each user to ``[(doc, days_left), ...]`` for the documents to
+    remind about now: those on active vehicles without an email ``ReminderLog``
+    row for today. ``doc_ids`` lists every document pulled, reminded or not, so
+    the caller can move all of them on to their next reminder. Only rows due on
+    ``ix_documents_next_reminder`` are read, however many documents exist.
+    ``user_range`` limits the sweep to users with ids in ``(first, last)``.
+    The query runs on the read replica when one is configured.
+    """
+    today = now.date()
+    day_start = datetime.combine(today, time.min)
+    day_end = day_start + timedelta(days=1)
+
+    already_sent = db.select(ReminderLog.id).where(
+        ReminderLog.document_id == Document.id,
+        ReminderLog.reminder_type == "email",
+        ReminderLog.sent_at >= day_start,
+        ReminderLog.sent_at < day_end,
+    ).exists()
+
+    query = (
+        db.select(Document, User, already_sent.label("already_sent"))
+        .join(Document.vehicle)
+        .join(Vehicle.owner)
+        .options(contains_eager(Document.vehicle))
+        .where(
+            Document.next_reminder_at <= now,
+            Document.status == "active",
+            Document.expiry_date.isnot(None),
+        )
+    )
+    if user_range:
+        query = query.where(Vehicle.user_id.between(*user_range))
+    rows = db.session.execute(
+        query.order_by(User.id, Document.expiry_date, Document.id), bind_arguments=replica_bind_arguments()
+    ).all()
+
+    due, doc_ids = {}, []
+    for doc, user, sent_today in rows:
+        doc_ids.append(doc.id)
+        if doc.vehicle.is_active and not sent_today:
+            due.setdefault(user, []).append((doc, (doc.expiry_date - today).days))
+    return due, doc_ids
+
+
+def build_reminder_body(user, expiring_docs):
+    lines = []
+    for doc, days_left in expiring_docs:
+        vehicle = doc.vehicle
+        if days_left < 0:
+            status = f"EXPIRED ({abs(days_left)} days ago)"
+        elif days_left == 0:
+            status = "EXPIRES TODAY"
+        else:
+            status = f"Expires in {days_left} days"
+
+        lines.append(
+            f"- {vehicle.registration_number} | {doc.doc_type_label} | "
+            f"Expiry: {doc.expiry_date.strftime('%d %b %Y')} | {status}"
+        )
+
+    return (
+        f"Hello {user.name},\n\n"
+        f"The following vehicle documents need your attention:\n\n"
+        + "\n".join(lines)
+        + "\n\nPlease renew them at the earliest.\n\n"
+        "— Vehicle Tracker"
+    )
+
+
+def check_expiry_and_send_reminders(app, user_range=None):
+    """Frequent job: queue one reminder email per user for documents now due.
+
+    The outbox messages, their ``ReminderLog`` rows and the move of each
+    swept document's ``next_reminder_at`` to tomorrow are written in the same
+    transaction, so a reminder is either fully queued or not at all; delivery
+    and retries are left to ``mailer.deliver_outbox``. Returns a stats dict;
+    ``queries`` stays constant however many users and documents are swept.
+    """
     with app.app_context():
-        today = date.today()
-        users = db.session.query(User).all()
+        started = perf_counter()
+        now = datetime.now()
+        stats = {"users": 0, "documents": 0, "emails_queued": 0, "queries": 0, "seconds": 0.0}
 
-        for user in users:
-            vehicles = db.session.query(Vehicle).filter_by(user_id=user.id, is_active=True).all()
-            vehicle_ids = [v.id for v in vehicles]
-            if not vehicle_ids:
-                continue
+        with count_queries(*db.engines.values()) as counter:
+            due, doc_ids = find_due_documents(now, user_range)
 
-            # Find documents expiring within their reminder_days
-            docs = db.session.query(Document).filter(
-                Document.vehicle_id.in_(vehicle_ids),
-                Document.status == "active",
-                Document.expiry_date.isnot(None),
-            ).all()
-
-            expiring_docs = []
-            for doc in docs:
-                days_left = (doc.expiry_date - today).days
-                if days_left <= doc.reminder_days:
-                    # Check if already emailed today
-                    already_sent = db.session.query(ReminderLog).filter(
-                        ReminderLog.document_id == doc.id,
-                        ReminderLog.reminder_type == "email",
-                        db.func.date(ReminderLog.sent_at) == today,
-                    ).first()
-                    if not already_sent:
-                        expiring_docs.append((doc, days_left))
-
-            if not expiring_docs:
-                continue
+            if doc_ids:
+                # Claim the documents on the primary by moving them on to tomorrow:
+                # only those still due there are reminded, so neither a concurrent
+                # sweep nor a lagging replica can send a reminder twice. Expired or
+                # still-expiring documents are reminded again tomorrow; keep
+                # updated_at, this is not a user edit
+                tomorrow = datetime.combine(now.date() + timedelta(days=1), time(Document.REMINDER_HOUR))
+                claimed = set(db.session.execute(
+                    db.update(Document)
+                    .where(Document.id.in_(doc_ids), Document.next_reminder_at <= now)
+                    .values(next_reminder_at=tomorrow, updated_at=Document.updated_at)
+                    .returning(Document.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars())
+                for user in list(due):
+                    due[user] = [(doc, days_left) for doc, days_left in due[user] if doc.id in claimed]
+                    if not due[user]:
+                        del due[user]
 
-            # Build and send email
-            try:
-                lines = []
-                for doc, days_left in expiring_docs:
-                    vehicle = doc.vehicle
-                    if days_left < 0:
-                        status = f"EXPIRED ({abs(days_left)} days ago)"
-                    elif days_left == 0:
-                        status = "EXPIRES TODAY"
-                    else:
-                        status = f"Expires in {days_left} days"
-
-                    lines.append(
-                        f"- {vehicle.registration_number} | {doc.doc_type_label} | "
-                        f"Expiry: {doc.expiry_date.strftime('%d %b %Y')} | {status}"
-                    )
-
-                body = (
-                    f"Hello {user.name},\n\n"
-                    f"The following vehicle documents need your attention:\n\n"
-                    + "\n".join(lines)
-                    + "\n\nPlease renew them at the earliest.\n\n"
-                    "— Vehicle Tracker"
-                )
-
-                msg = Message(
-                    subject="Vehicle Document Expiry Reminder",
-                    recipients=[user.email],
-                    body=body,
-                )
-                mail.send(msg)
-
-                # Log reminders
+            messages, logs = [], []
+            sent_at = datetime.utcnow()
+            for user, expiring_docs in due.items():
+                stats["users"] += 1
+                stats["documents"] += len(expiring_docs)
+                messages.append({
+                    "user_id": user.id,
+                    "recipient": user.email,
+                    "subject": "Vehicle Document Expiry Reminder",
+                    "body": build_reminder_body(user, expiring_docs),
+                    "status": "pending",
+                    "attempts": 0,
+                    "next_attempt_at": sent_at,
+                    "created_at": sent_at,
+                })
                 for doc, days_left in expiring_docs:
-                    log = ReminderLog(
-                        document_id=doc.id,
-                        reminder_type="email",
-                        message=f"Expiry reminder sent. {days_left} days remaining.",
-                    )
-                    db.session.add(log)
+                    logs.append({
+                        "document_id": doc.id,
+                        "reminder_type": "email",
+                        "sent_at": sent_at,
+                        "message": f"Expiry reminder queued. {days_left} days remaining.",
+                    })
 
-                db.session.commit()
+            if messages:
+                db.session.execute(insert(OutboxMessage), messages)
+                db.session.execute(insert(ReminderLog), logs)
+            db.session.commit()
+            stats["emails_queued"] = len(messages)
 
-            except Exception as e:
-                print(f"[Reminder] Failed to send email to {user.email}: {e}")
+        stats["queries"] = counter["queries"]
+        stats["seconds"] = perf_counter() - started
+        metrics.SWEEP_SECONDS.observe(stats["seconds"])
+        metrics.SWEEP_DOCUMENTS.inc(stats["documents"])
+        metrics.EMAILS_QUEUED.inc(stats["emails_queued"])
+        metrics.LAST_SWEEP.set(datetime.utcnow().timestamp())
+        if not doc_ids:
+            return stats
+        print(
+            f"[Reminder] Sweep {'of users %d-%d ' % user_range if user_range else ''}done: "
+            f"{stats['emails_queued']} emails queued for {stats['users']} users "
+            f"covering {stats['documents']} documents, {stats['queries']} queries "
+            f"in {stats['seconds'] * 1000:.0f}ms"
+        )
 
+    if stats["emails_queued"]:
+        deliver_outbox(app)
+    return stats
 
-def start_scheduler(app):
-    """Start APScheduler with daily expiry check at 8:00 AM."""
-    # Only start in the main process (avoid double-start with Flask reloader)
-    import os
-    if os.environ.get("WERKZEUG_RUN_MAIN") != "true" and app.debug:
-        return
 
-    scheduler = BackgroundScheduler()
+def user_id_ranges(shards):
+    """Split the users table into ``shards`` contiguous ``(first_id, last_id)`` ranges."""
+    first, last = db.session.execute(db.select(db.func.min(User.id), db.func.max(User.id))).one()
+    if first is None:
+        return []
+    size = -(-(last - first + 1) // shards)
+    return [(start, min(start + size - 1, last)) for start in range(first, last + 1, size)]
+
+
+def run_reminder_sweep(app):
+    """Scheduled entry point: run each shard of the sweep that no other process holds.
+
+    Every worker's scheduler runs this job; each run takes the locks of the
+    shards still free, so with several workers the shards run in parallel
+    and none runs twice concurrently. A run that locks a shard right after
+    another finished it finds nothing due, since the swept documents have
+    already moved on to tomorrow. Returns the stats of the shards this
+    process ran.
+    """
+    from app_package.leader import job_lock
+
+    with app.app_context():
+        shards = max(1, app.config["SCHEDULER_SHARDS"])
+        ranges = user_id_ranges(shards) if shards > 1 else [None]
+        engine = db.engine
+    ttl = app.config["SCHEDULER_LOCK_TTL"]
+
+    results = []
+    for index, user_range in enumerate(ranges):
+        with job_lock(engine, f"expiry_reminder:{index}/{shards}", ttl) as acquired:
+            if not acquired:
+                continue
+            results.append(check_expiry_and_send_reminders(app, user_range))
+    return results
+
+
+def build_scheduler(app, scheduler_class=BackgroundScheduler):
+    """Scheduler with the reminder sweep, outbox retries and (optionally) the OCR drain."""
+    scheduler = scheduler_class()
     scheduler.add_job(
-        func=check_expiry_and_send_reminders,
+        func=run_reminder_sweep,
         args=[app],
-        trigger="cron",
-        hour=8,
-        minute=0,
+        trigger="interval",
+        minutes=app.config["REMINDER_SWEEP_MINUTES"],
         id="expiry_reminder",
         replace_existing=True,
     )
+    # Retries of failed sends
+    scheduler.add_job(
+        func=deliver_outbox,
+        args=[app],
+        trigger="interval",
+        minutes=1,
+        id="outbox",
+        replace_existing=True,
+    )
+    if app.config["OCR_EMBEDDED_WORKER"]:
+        from app_package.ocr_queue import drain_ocr_queue
+        scheduler.add_job(
+            func=drain_ocr_queue,
+            args=[app],
+            trigger="interval",
+            seconds=30,
+            id="ocr_queue",
+            replace_existing=True,
+        )
+    return scheduler
+
+
+def start_scheduler(app):
+    """Start APScheduler with the reminder sweep every few minutes."""
+    # Only start in the main process (avoid double-start with Flask reloader)
+    import os
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true" and app.debug:
+        return
+    scheduler = build_scheduler(app)
     scheduler.start()
+    app.extensions["scheduler"] = scheduler
+
+
+def run_scheduler(app):
+    """Run the scheduled jobs in the foreground, in a process of their own.
+
+    Used with ``FAST_STARTUP``, where web workers leave the scheduler off.
+    """
+    if "scheduler" in app.extensions:
+        # create_app already started it in this process (SCHEDULER_ENABLED=true)
+        app.extensions["scheduler"].shutdown()
+    scheduler = build_scheduler(app, BlockingScheduler)
+    print(f"[Scheduler] Running jobs: {', '.join(job.id for job in scheduler.get_jobs())}")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
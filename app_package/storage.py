@@ -0,0 +1,214 @@
+"""Content-addressed upload storage.
+
+Files are stored once per distinct content under ``UPLOAD_FOLDER/ab/cd/<sha256>.<ext>``,
+so no directory grows past a few hundred entries and identical scans share
+one blob. ``stored_files`` counts the documents referencing each blob; a
+blob is deleted from disk only after the commit that drops its last
+reference, and only if no upload of the same content has referenced it
+again in the meantime (see ``_unlink_blob``).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from app_package import db
+from app_package.models import StoredFile
+
+CHUNK_SIZE = 1024 * 1024
+TMP_DIR = "tmp"
+
+
+def blob_path(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def is_stored_path(file_path):
+    """True for blob paths; uploads from before content addressing sit flat in UPLOAD_FOLDER."""
+    return "/" in (file_path or "")
+
+
+def blob_digest(file_path):
+    """SHA-256 of a stored file, read from its path; None for legacy flat uploads."""
+    if not is_stored_path(file_path):
+        return None
+    return os.path.basename(file_path).split(".", 1)[0]
+
+
+def _add_reference(path, digest, size):
+    updated = db.session.execute(
+        db.update(StoredFile).where(StoredFile.path == path).values(ref_count=StoredFile.ref_count + 1)
+    ).rowcount
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredFile(path=path, sha256=digest, size=size, ref_count=1))
+    except IntegrityError:
+        # Another request stored the same content first
+        db.session.execute(
+            db.update(StoredFile).where(StoredFile.path == path).values(ref_count=StoredFile.ref_count + 1)
+        )
+
+
+def _place(tmp_path, path, upload_folder):
+    """Move a hashed temp file to its blob path.
+
+    An existing blob is replaced rather than kept: it holds the same bytes,
+    and it may be about to be unlinked by the delete of its last reference.
+    """
+    full = os.path.join(upload_folder, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    os.replace(tmp_path, full)
+
+
+def save_stream(stream, ext, upload_folder):
+    """Store an upload stream, hashing it while it is written; returns the blob path.
+
+    The reference is added to the session, so the caller commits it together
+    with the document that points at the blob.
+    """
+    tmp_dir = os.path.join(upload_folder, TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        path = blob_path(digest.hexdigest(), ext)
+        # Reference first: it waits for a concurrent unlink of the same blob
+        _add_reference(path, digest.hexdigest(), size)
+        _place(tmp_path, path, upload_folder)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def store_file(source, ext, upload_folder):
+    """Store a copy of a file already on disk; returns the blob path."""
+    tmp_dir = os.path.join(upload_folder, TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        path = blob_path(digest.hexdigest(), ext)
+        _add_reference(path, digest.hexdigest(), size)
+        _place(tmp_path, path, upload_folder)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def release(file_path, upload_folder):
+    """Drop one document's reference to ``file_path``.
+
+    The file itself is removed after the session commits, and only once no
+    document references it any more.
+    """
+    if not file_path:
+        return
+    if is_stored_path(file_path):
+        db.session.execute(
+            db.update(StoredFile).where(StoredFile.path == file_path).values(ref_count=StoredFile.ref_count - 1)
+        )
+        remaining = db.session.scalar(db.select(StoredFile.ref_count).where(StoredFile.path == file_path))
+        if remaining is not None and remaining > 0:
+            return
+        db.session.execute(db.delete(StoredFile).where(StoredFile.path == file_path))
+    db.session.info.setdefault("storage_deletes", []).append((file_path, upload_folder))
+
+
+def _unlink_blob(engine, file_path, upload_folder):
+    """Remove a released file from disk unless its content was uploaded again.
+
+    Between the release committing and this unlink, an upload of identical
+    content may have added a new ``stored_files`` row and placed the blob.
+    Inserting a placeholder row for the path settles the race: it fails if
+    such a row exists, and an upload that has yet to insert one waits on the
+    placeholder until the file is gone and then places it again.
+    """
+    full = os.path.join(upload_folder, file_path)
+    if not is_stored_path(file_path):
+        if os.path.exists(full):
+            os.remove(full)
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(db.insert(StoredFile).values(path=file_path, sha256=blob_digest(file_path), size=0,
+                                                      ref_count=0))
+            if os.path.exists(full):
+                os.remove(full)
+            conn.execute(db.delete(StoredFile).where(StoredFile.path == file_path, StoredFile.ref_count == 0))
+    except IntegrityError:
+        # Referenced again since the release; the new document keeps the blob
+        pass
+
+
+@event.listens_for(db.session, "after_commit")
+def _delete_released_files(session):
+    for file_path, upload_folder in session.info.pop("storage_deletes", []):
+        _unlink_blob(db.engine, file_path, upload_folder)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _keep_released_files(session):
+    session.info.pop("storage_deletes", None)
+
+
+def migrate_flat_uploads(upload_folder, batch_size=200):
+    """Move documents' flat ``<uuid>.<ext>`` uploads into blob storage.
+
+    Files are copied into place and the flat originals removed only after
+    each batch commits, so an interrupted run can simply be restarted.
+    Returns ``{"documents", "blobs_created", "deduplicated", "missing"}``.
+    """
+    from app_package.models import Document
+
+    report = {"documents": 0, "blobs_created": 0, "deduplicated": 0, "missing": 0}
+    last_id = 0
+    while True:
+        docs = db.session.execute(
+            db.select(Document)
+            .where(Document.id > last_id, Document.file_path.isnot(None), Document.file_path != "",
+                   Document.file_path.notlike("%/%"))
+            .order_by(Document.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not docs:
+            break
+
+        migrated = []
+        for doc in docs:
+            last_id = doc.id
+            source = os.path.join(upload_folder, doc.file_path)
+            if not os.path.exists(source):
+                report["missing"] += 1
+                continue
+            ext = doc.file_path.rsplit(".", 1)[1].lower() if "." in doc.file_path else "bin"
+            path = store_file(source, ext, upload_folder)
+            refs = db.session.scalar(db.select(StoredFile.ref_count).where(StoredFile.path == path))
+            report["deduplicated" if refs > 1 else "blobs_created"] += 1
+            report["documents"] += 1
+            doc.file_path = path
+            migrated.append(source)
+        db.session.commit()
+
+        for source in migrated:
+            os.remove(source)
+    return report
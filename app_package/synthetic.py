@@ -0,0 +1,171 @@
+"""Synthetic fleets for load testing and benchmarks.
+
+Generates users, vehicles and documents whose expiry dates look like a real
+fleet's: each document type renews on its own cycle, so expiries spread
+across that cycle, a few lapse without being renewed, some vehicles carry
+older renewed copies, and a handful of scans never had a date read. Rows
+are written with bulk Core inserts, so ``next_reminder_at`` is computed here
+rather than by the ORM events.
+"""
+import random
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app_package import db
+from app_package.models import User, Vehicle, Document
+
+SYNTHETIC_DOMAIN = "fleet.example.test"
+SYNTHETIC_PASSWORD = "synthetic-fleet"
+
+# Renewal cycle in days; types earlier in the list are the ones most vehicles carry
+VALIDITY_DAYS = {
+    "insurance": 365,
+    "puc": 180,
+    "rc": 15 * 365,
+    "tax": 5 * 365,
+    "fitness": 365,
+    "permit": 5 * 365,
+    "dl": 20 * 365,
+}
+COMMERCIAL_TYPES = {"truck", "bus", "auto"}
+VEHICLE_TYPE_WEIGHTS = {"car": 50, "bike": 25, "truck": 12, "auto": 8, "bus": 5}
+MAKES = {
+    "car": [("Maruti", "Swift"), ("Hyundai", "Creta"), ("Tata", "Nexon"), ("Mahindra", "XUV700"), ("Honda", "City")],
+    "bike": [("Hero", "Splendor"), ("Honda", "Activa"), ("Bajaj", "Pulsar"), ("TVS", "Apache")],
+    "truck": [("Tata", "Signa"), ("Ashok Leyland", "Dost"), ("Eicher", "Pro 2049")],
+    "auto": [("Bajaj", "RE"), ("Piaggio", "Ape")],
+    "bus": [("Tata", "Starbus"), ("Ashok Leyland", "Viking")],
+}
+STATE_CODES = ["KA", "MH", "DL", "TN", "KL", "GJ", "RJ", "UP", "WB", "TS"]
+
+LAPSED_SHARE = 0.06  # active documents left past expiry
+UNDATED_SHARE = 0.03  # scans OCR could not read a date from
+INACTIVE_VEHICLE_SHARE = 0.05
+REMINDER_DAY_CHOICES = [7, 15, 30, 30, 30, 60]
+
+
+def _registration(rng):
+    letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(2))
+    return f"{rng.choice(STATE_CODES)}{rng.randint(1, 99):02d}{letters}{rng.randint(1, 9999):04d}"
+
+
+def _vehicle_row(rng, user_id, now):
+    vehicle_type = rng.choices(list(VEHICLE_TYPE_WEIGHTS), weights=list(VEHICLE_TYPE_WEIGHTS.values()))[0]
+    make, model = rng.choice(MAKES[vehicle_type])
+    return {
+        "user_id": user_id,
+        "registration_number": _registration(rng),
+        "make": make,
+        "model": model,
+        "year": rng.randint(now.year - 15, now.year),
+        "vehicle_type": vehicle_type,
+        "fuel_type": "electric" if rng.random() < 0.05 else ("diesel" if vehicle_type in COMMERCIAL_TYPES else "petrol"),
+        "notes": None,
+        "is_active": rng.random() >= INACTIVE_VEHICLE_SHARE,
+        "created_at": now,
+    }
+
+
+def _document_rows(rng, vehicle_id, vehicle_type, count, today, now):
+    """``count`` documents for one vehicle: one active per type, then renewed copies."""
+    types = [t for t in VALIDITY_DAYS if t not in ("fitness", "permit") or vehicle_type in COMMERCIAL_TYPES]
+    rows = []
+    active = {}
+    for i in range(count):
+        if i < len(types):
+            doc_type = types[i]
+            validity = VALIDITY_DAYS[doc_type]
+            if rng.random() < UNDATED_SHARE:
+                expiry = None
+            elif rng.random() < LAPSED_SHARE:
+                expiry = today - timedelta(days=rng.randint(1, 400))
+            else:
+                expiry = today + timedelta(days=rng.randrange(validity))
+            active[doc_type] = expiry
+            status = "active"
+        else:
+            # Older policy or certificate replaced at renewal
+            doc_type = rng.choice(list(active))
+            validity = VALIDITY_DAYS[doc_type]
+            latest = active[doc_type] or today
+            expiry = latest - timedelta(days=validity * rng.randint(1, 3))
+            status = "renewed"
+
+        reminder_days = rng.choice(REMINDER_DAY_CHOICES)
+        rows.append({
+            "vehicle_id": vehicle_id,
+            "doc_type": doc_type,
+            "doc_number": f"{doc_type.upper()}{rng.randint(10 ** 9, 10 ** 10 - 1)}",
+            "issuer": None,
+            "issue_date": expiry - timedelta(days=validity) if expiry else None,
+            "expiry_date": expiry,
+            "reminder_days": reminder_days,
+            "status": status,
+            "next_reminder_at": Document.compute_next_reminder_at(expiry, reminder_days, status),
+            "created_at": now,
+            "updated_at": now,
+        })
+    return rows
+
+
+def generate_fleet(documents, vehicles_per_user=10, documents_per_vehicle=4, seed=None, batch_size=10000):
+    """Insert a synthetic fleet of about ``documents`` documents.
+
+    Users are created as ``user<n>@fleet.example.test`` with the password
+    ``SYNTHETIC_PASSWORD``, numbered on from any synthetic users already in
+    the database so the command can be run repeatedly. Each batch of about
+    ``batch_size`` documents is committed on its own. Returns
+    ``{"users", "vehicles", "documents", "first_email", "seconds"}``.
+    """
+    started = datetime.now()
+    rng = random.Random(seed)
+    today = date.today()
+    documents_per_user = vehicles_per_user * documents_per_vehicle
+    total_users = max(1, -(-documents // documents_per_user))
+    users_per_batch = max(1, batch_size // documents_per_user)
+    # Hashing is deliberately slow; every synthetic user shares one hash
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    first_index = db.session.scalar(
+        db.select(db.func.count(User.id)).where(User.email.like(f"%@{SYNTHETIC_DOMAIN}"))
+    ) + 1
+
+    report = {"users": 0, "vehicles": 0, "documents": 0,
+              "first_email": f"user{first_index}@{SYNTHETIC_DOMAIN}", "seconds": 0.0}
+    remaining = documents
+    for batch_start in range(0, total_users, users_per_batch):
+        now = datetime.utcnow()
+        count = min(users_per_batch, total_users - batch_start)
+        user_ids = db.session.execute(
+            db.insert(User).returning(User.id),
+            [{
+                "name": f"Fleet User {first_index + batch_start + i}",
+                "email": f"user{first_index + batch_start + i}@{SYNTHETIC_DOMAIN}",
+                "phone": None,
+                "password_hash": password_hash,
+                "is_active_user": True,
+                "created_at": now,
+            } for i in range(count)],
+        ).scalars().all()
+
+        vehicle_rows = [_vehicle_row(rng, user_id, now) for user_id in user_ids for _ in range(vehicles_per_user)]
+        vehicle_ids = db.session.execute(
+            db.insert(Vehicle).returning(Vehicle.id, Vehicle.vehicle_type), vehicle_rows
+        ).all()
+
+        document_rows = []
+        for vehicle_id, vehicle_type in vehicle_ids:
+            take = min(documents_per_vehicle, remaining)
+            remaining -= take
+            if take:
+                document_rows.extend(_document_rows(rng, vehicle_id, vehicle_type, take, today, now))
+        if document_rows:
+            db.session.execute(db.insert(Document), document_rows)
+        db.session.commit()
+
+        report["users"] += len(user_ids)
+        report["vehicles"] += len(vehicle_ids)
+        report["documents"] += len(document_rows)
+        if total_users > users_per_batch:
+            print(f"[Seed] {report['documents']}/{documents} documents")
+
+    report["seconds"] = (datetime.now() - started).total_seconds()
+    return report
@@ -0,0 +1,188 @@
+"""Document thumbnails, generated on first request and cached on disk.
+
+Thumbnails live under ``UPLOAD_FOLDER/thumbs`` so they can be served (and
+offloaded to the proxy) exactly like stored files. They are keyed on the
+stored file's content hash, size and ``THUMBNAIL_VERSION``; the cache is
+kept under ``THUMBNAIL_CACHE_MAX_BYTES`` by evicting the least recently used.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from app_package import storage
+
+# Pillow and pdf2image are imported on first render, keeping them out of worker startup
+Image = ImageOps = convert_from_path = None
+THUMBNAILS_AVAILABLE = PDF_PREVIEW_AVAILABLE = False
+PDF_ERRORS = ()  # pdf2image's exceptions, which do not subclass OSError
+_imaging_loaded = False
+
+
+def load_imaging():
+    global Image, ImageOps, convert_from_path, THUMBNAILS_AVAILABLE, PDF_PREVIEW_AVAILABLE, PDF_ERRORS, _imaging_loaded
+    if _imaging_loaded:
+        return
+    try:
+        from PIL import Image, ImageOps
+        THUMBNAILS_AVAILABLE = True
+    except ImportError:
+        THUMBNAILS_AVAILABLE = False
+
+    try:
+        from pdf2image import convert_from_path
+        from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+        PDF_ERRORS = (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError)
+        # pdf2image shells out to poppler, which is a system package
+        PDF_PREVIEW_AVAILABLE = shutil.which("pdfinfo") is not None
+    except ImportError:
+        PDF_PREVIEW_AVAILABLE = False
+    _imaging_loaded = True
+
+
+THUMBNAIL_DIR = "thumbs"
+THUMBNAIL_SIZES = {"sm": 160, "md": 480, "lg": 1200}  # longest side in pixels
+THUMBNAIL_VERSION = 1  # bump when the rendering changes to invalidate cached files
+JPEG_QUALITY = 80
+EVICT_EVERY = 50  # generations between cache size checks
+
+_generated = 0
+
+
+def thumbnail_digest(file_path):
+    """Content hash for stored files; legacy flat uploads are keyed on their unique name."""
+    return storage.blob_digest(file_path) or hashlib.sha256(file_path.encode()).hexdigest()
+
+
+def thumbnail_path(file_path, size):
+    """Path of a thumbnail relative to UPLOAD_FOLDER."""
+    digest = thumbnail_digest(file_path)
+    return f"{THUMBNAIL_DIR}/{digest[:2]}/{digest}-{size}-v{THUMBNAIL_VERSION}.jpg"
+
+
+def thumbnail_etag(file_path, size):
+    """Strong ETag for thumbnails of content-addressed files, None otherwise."""
+    digest = storage.blob_digest(file_path)
+    return f"{digest}-{size}-v{THUMBNAIL_VERSION}" if digest else None
+
+
+def _load_image(source, max_side):
+    """Open ``source`` for thumbnailing; the caller closes the returned image."""
+    if source.lower().endswith(".pdf"):
+        if not PDF_PREVIEW_AVAILABLE:
+            return None
+        # Render only the first page, already scaled close to the target size
+        pages = convert_from_path(source, first_page=1, last_page=1, size=(max_side, None))
+        return pages[0] if pages else None
+    image = Image.open(source)
+    # Let the JPEG decoder downscale while decoding large phone photos
+    image.draft("RGB", (max_side, max_side))
+    return image
+
+
+def render_thumbnail(source, dest, max_side):
+    """Write a JPEG no larger than ``max_side`` of ``source``; returns False if it cannot be rendered."""
+    load_imaging()
+    source_image = _load_image(source, max_side)
+    if source_image is None:
+        return False
+    # Closes the source file even when decoding fails
+    with source_image:
+        image = ImageOps.exif_transpose(source_image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def get_thumbnail(upload_folder, file_path, size, max_bytes):
+    """Return the cached thumbnail path (relative to UPLOAD_FOLDER), generating it if needed.
+
+    Returns None when the file cannot be previewed.
+    """
+    global _generated
+    load_imaging()
+    if not THUMBNAILS_AVAILABLE or size not in THUMBNAIL_SIZES:
+        return None
+    rel = thumbnail_path(file_path, size)
+    full = os.path.join(upload_folder, rel)
+    if os.path.exists(full):
+        # mtime doubles as last-used time for eviction
+        os.utime(full)
+        return rel
+
+    source = os.path.join(upload_folder, file_path)
+    if not os.path.exists(source):
+        return None
+    try:
+        if not render_thumbnail(source, full, THUMBNAIL_SIZES[size]):
+            return None
+    except (OSError, ValueError, Image.DecompressionBombError) + PDF_ERRORS as e:
+        # Unreadable or oversized (decompression bomb) images and broken PDFs get no preview
+        print(f"[Thumbnail] Could not render {file_path}: {e}")
+        return None
+
+    _generated += 1
+    if _generated % EVICT_EVERY == 0:
+        evict_thumbnails(upload_folder, max_bytes)
+    return rel
+
+
+def pdf_previews_available():
+    """Whether PDF thumbnails can be rendered here (pdf2image and poppler installed)."""
+    load_imaging()
+    return THUMBNAILS_AVAILABLE and PDF_PREVIEW_AVAILABLE
+
+
+def pregenerate_thumbnails(upload_folder, file_path, sizes, max_bytes):
+    """Background hook: render ``sizes`` ahead of the first page view."""
+    for size in sizes:
+        get_thumbnail(upload_folder, file_path, size, max_bytes)
+
+
+def cache_usage(upload_folder):
+    """``[(mtime, bytes, path)]`` for every cached thumbnail."""
+    entries = []
+    for dirpath, _, filenames in os.walk(os.path.join(upload_folder, THUMBNAIL_DIR)):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def evict_thumbnails(upload_folder, max_bytes):
+    """Delete least recently used thumbnails until the cache is under 90% of ``max_bytes``."""
+    entries = cache_usage(upload_folder)
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
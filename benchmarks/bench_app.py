@@ -0,0 +1,205 @@
+"""Benchmark: end-to-end latency and SQL counts of the hot pages and jobs.
+
+Seeds a synthetic fleet (see ``flask seed-fleet``) into a scratch SQLite
+database, or uses the one at ``--database-url``, then drives the dashboard,
+vehicle and document lists through the Flask test client as one synthetic
+account (with the page caches off, then the cached pages again warm), runs
+the reminder sweep and the OCR date parser, and reports p50/p95/p99 latency
+and queries per call. ``--json`` saves the results and ``--compare`` prints
+the p95 change against a saved run.
+
+    python benchmarks/bench_app.py [--documents 10000] [--requests 50] [--vehicles-per-user 10]
+    python benchmarks/bench_app.py --database-url postgresql://... --no-seed --json after.json --compare before.json
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_corpus.json")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(seconds, queries):
+    return {
+        "calls": len(seconds),
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "max_ms": max(seconds) * 1000,
+        "queries": max(queries),
+    }
+
+
+def bench_page(client, engine, url, requests):
+    from app_package.metrics import count_queries
+
+    client.get(url)  # compile templates and warm caches outside the measurement
+    seconds, queries = [], []
+    for _ in range(requests):
+        with count_queries(engine) as counter:
+            started = time.perf_counter()
+            response = client.get(url)
+            seconds.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f"GET {url} returned {response.status_code}")
+        queries.append(counter["queries"])
+    return summarize(seconds, queries), response.get_data(as_text=True)
+
+
+@contextmanager
+def page_caches_disabled(app):
+    """Run the block with the dashboard and identity caches off, so every request hits the database."""
+    saved = {key: app.config[key] for key in ("DASHBOARD_CACHE_TTL", "IDENTITY_CACHE_TTL")}
+    app.config.update(dict.fromkeys(saved, 0))
+    try:
+        yield
+    finally:
+        app.config.update(saved)
+
+
+def bench_sweep(app, runs):
+    """Run the reminder sweep ``runs`` times over the same due documents.
+
+    After each run the swept documents' ``next_reminder_at`` is put back and
+    the queued emails and logs are deleted, so every run does a full day's work.
+    """
+    from app_package import db
+    from app_package.models import Document, OutboxMessage, ReminderLog
+    from app_package.scheduler import check_expiry_and_send_reminders
+
+    seconds, queries = [], []
+    documents = 0
+    for _ in range(runs):
+        with app.app_context():
+            started = datetime.utcnow()
+            due = [{"id": doc_id, "next_reminder_at": at} for doc_id, at in db.session.execute(
+                db.select(Document.id, Document.next_reminder_at).where(Document.next_reminder_at <= datetime.now())
+            )]
+            db.session.commit()
+        stats = check_expiry_and_send_reminders(app)
+        seconds.append(stats["seconds"])
+        queries.append(stats["queries"])
+        documents = stats["documents"]
+        with app.app_context():
+            if due:
+                db.session.execute(db.update(Document), due)
+            db.session.execute(db.delete(ReminderLog).where(ReminderLog.sent_at >= started))
+            db.session.execute(db.delete(OutboxMessage).where(OutboxMessage.created_at >= started))
+            db.session.commit()
+    return summarize(seconds, queries), documents
+
+
+def bench_date_parser(iterations):
+    from app_package.ocr_utils import find_expiry_date_from_text
+
+    with open(CORPUS_PATH) as f:
+        texts = [sample["text"] for sample in json.load(f)]
+    seconds = []
+    for _ in range(iterations):
+        for text in texts:
+            started = time.perf_counter()
+            find_expiry_date_from_text(text)
+            seconds.append(time.perf_counter() - started)
+    return summarize(seconds, [0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Database to use (default: a scratch SQLite file).")
+    parser.add_argument("--no-seed", action="store_true", help="Use the synthetic fleet already in the database.")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--vehicles-per-user", type=int, default=10)
+    parser.add_argument("--documents-per-vehicle", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per page.")
+    parser.add_argument("--sweep-runs", type=int, default=5)
+    parser.add_argument("--parser-iterations", type=int, default=50)
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Results file from an earlier run to compare p95 against.")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tmp, "bench.db")
+    os.environ["OCR_EMBEDDED_WORKER"] = "false"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["SLOW_REQUEST_MS"] = "0"
+    from config import Config
+    Config.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    Config.OCR_CACHE_PATH = ""
+    Config.MAIL_SUPPRESS_SEND = True
+    Config.OUTBOX_RATE_LIMIT = 0
+
+    from app_package import create_app, db
+    from app_package.models import User
+    from app_package.synthetic import SYNTHETIC_DOMAIN, SYNTHETIC_PASSWORD, generate_fleet
+
+    app = create_app()
+    with app.app_context():
+        if not args.no_seed:
+            report = generate_fleet(args.documents, vehicles_per_user=args.vehicles_per_user,
+                                    documents_per_vehicle=args.documents_per_vehicle, seed=args.seed)
+            print(f"Seeded {report['documents']} documents for {report['users']} users in {report['seconds']:.1f}s")
+        email = db.session.scalar(
+            db.select(User.email).where(User.email.like(f"%@{SYNTHETIC_DOMAIN}")).order_by(User.id).limit(1)
+        )
+        if email is None:
+            raise SystemExit("No synthetic users found; run without --no-seed or `flask seed-fleet` first")
+        engine = db.engine
+
+    client = app.test_client()
+    client.post("/auth/login", data={"email": email, "password": SYNTHETIC_PASSWORD})
+
+    results = {}
+    # Pages are measured cold, so query regressions show up behind the caches too
+    with page_caches_disabled(app):
+        results["dashboard.index"], _ = bench_page(client, engine, "/", args.requests)
+        results["vehicles.list_vehicles"], _ = bench_page(client, engine, "/vehicles/", args.requests)
+        results["documents.list_documents"], page = bench_page(client, engine, "/documents/", args.requests)
+        cursor = re.search(r"cursor=([^&\"]+)", page)
+        if cursor:
+            results["documents.list_documents (page 2)"], _ = bench_page(
+                client, engine, f"/documents/?cursor={cursor.group(1)}", args.requests)
+        results["documents.list_documents (expired)"], _ = bench_page(
+            client, engine, "/documents/?urgency=expired", args.requests)
+    results["dashboard.index (warm cache)"], _ = bench_page(client, engine, "/", args.requests)
+    results["vehicles.list_vehicles (warm cache)"], _ = bench_page(client, engine, "/vehicles/", args.requests)
+    results["reminder sweep"], swept = bench_sweep(app, args.sweep_runs)
+    results["ocr date parser"] = bench_date_parser(args.parser_iterations)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"\nlogged in as {email}; reminder sweep covers {swept} documents\n")
+    header = f"{'benchmark':<38}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'queries':>9}"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<38}{r['calls']:>7}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['queries']:>9}")
+        if name in baseline:
+            change = (r["p95_ms"] / baseline[name]["p95_ms"] - 1) * 100
+            queries = r["queries"] - baseline[name]["queries"]
+            line += f"  {change:+6.1f}%" + (f" ({queries:+d} queries)" if queries else "")
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
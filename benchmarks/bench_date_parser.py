@@ -0,0 +1,114 @@
+"""Micro-benchmark: legacy vs compiled OCR date extraction.
+
+Runs both engines over the sample OCR texts in ``ocr_corpus.json`` and reports
+accuracy against the expected expiry dates and throughput.
+
+    python benchmarks/bench_date_parser.py [--iterations 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_package.ocr_utils import EXPIRY_KEYWORDS, find_expiry_date_from_text  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_corpus.json")
+
+
+# --- Legacy engine (the implementation before the compiled engine) ---
+
+LEGACY_DATE_PATTERNS = [
+    r'\d{2}[/\-\.]\d{2}[/\-\.]\d{4}',
+    r'\d{4}[/\-\.]\d{2}[/\-\.]\d{2}',
+]
+
+
+def legacy_extract_dates_from_text(text):
+    dates = []
+    for pattern in LEGACY_DATE_PATTERNS:
+        dates.extend(re.findall(pattern, text))
+    return dates
+
+
+def legacy_parse_date(date_str):
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def legacy_find_expiry_date_from_text(text):
+    best_date = None
+    for line in text.split("\n"):
+        line_lower = line.lower()
+        if any(kw in line_lower for kw in EXPIRY_KEYWORDS):
+            for d in legacy_extract_dates_from_text(line):
+                parsed = legacy_parse_date(d)
+                if parsed and (best_date is None or parsed > best_date):
+                    best_date = parsed
+    if best_date:
+        return best_date
+
+    valid_dates = [d for d in map(legacy_parse_date, legacy_extract_dates_from_text(text)) if d]
+    return max(valid_dates) if valid_dates else None
+
+
+ENGINES = [
+    ("legacy", legacy_find_expiry_date_from_text),
+    ("compiled", find_expiry_date_from_text),
+]
+
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        samples = json.load(f)
+    for sample in samples:
+        sample["expected"] = date.fromisoformat(sample["expected"]) if sample["expected"] else None
+    return samples
+
+
+def run(engine, samples, iterations):
+    misses = [s["name"] for s in samples if engine(s["text"]) != s["expected"]]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for sample in samples:
+            engine(sample["text"])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "accuracy": (len(samples) - len(misses)) / len(samples),
+        "docs_per_sec": len(samples) * iterations / elapsed,
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    samples = load_corpus()
+    print(f"{len(samples)} samples x {args.iterations} iterations\n")
+    print(f"{'engine':<12} {'accuracy':>9} {'docs/sec':>12}")
+    results = {}
+    for name, engine in ENGINES:
+        results[name] = result = run(engine, samples, args.iterations)
+        print(f"{name:<12} {result['accuracy']:>8.1%} {result['docs_per_sec']:>12,.0f}")
+
+    speedup = results["compiled"]["docs_per_sec"] / results["legacy"]["docs_per_sec"]
+    print(f"\nspeedup: {speedup:.2f}x")
+    for name, result in results.items():
+        if result["misses"]:
+            print(f"{name} misses: {', '.join(result['misses'])}")
+
+
+if __name__ == "__main__":
+    main()
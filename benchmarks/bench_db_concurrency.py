@@ -0,0 +1,159 @@
+"""Benchmark: mixed read/write throughput under each database engine profile.
+
+For every profile that applies to the database, seeds a synthetic fleet and
+runs reader threads building dashboards alongside writer threads logging
+reminders the way the sweep does, then reports operations per second,
+latency percentiles and failed operations (e.g. "database is locked").
+SQLite profiles each get a fresh scratch file, since WAL mode persists in
+the file; a Postgres URL is shared by all its profiles.
+
+    python benchmarks/bench_db_concurrency.py [--seconds 10] [--readers 8] [--writers 2] [--documents 5000]
+    python benchmarks/bench_db_concurrency.py --database-url postgresql://localhost/vt_bench
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {"read": [], "write": []}
+        self.errors = {"read": 0, "write": 0}
+        self.last_error = None
+
+    def record(self, kind, seconds=None, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[kind].append(seconds)
+            else:
+                self.errors[kind] += 1
+                self.last_error = str(error).splitlines()[0]
+
+
+def reader(app, user_ids, deadline, results):
+    from app_package.routes.dashboard import dashboard_data
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                dashboard_data(random.choice(user_ids), date.today())
+        except Exception as e:
+            results.record("read", error=e)
+        else:
+            results.record("read", time.perf_counter() - started)
+
+
+def writer(app, document_ids, deadline, results, batch):
+    """Write like the reminder sweep: a batch of log rows and a due-date update per commit."""
+    from app_package import db
+    from app_package.models import Document, ReminderLog
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        ids = random.sample(document_ids, batch)
+        try:
+            with app.app_context():
+                now = datetime.utcnow()
+                db.session.execute(db.insert(ReminderLog), [
+                    {"document_id": doc_id, "reminder_type": "email", "sent_at": now, "message": "benchmark"}
+                    for doc_id in ids
+                ])
+                db.session.execute(
+                    db.update(Document).where(Document.id.in_(ids))
+                    .values(next_reminder_at=now).execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+        except Exception as e:
+            results.record("write", error=e)
+        else:
+            results.record("write", time.perf_counter() - started)
+
+
+def run_profile(profile, database_url, args):
+    from config import Config
+    from app_package import create_app, db
+    from app_package.models import Document, User
+    from app_package.synthetic import SYNTHETIC_DOMAIN, generate_fleet
+
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.DB_PROFILE = profile
+    app = create_app()
+    with app.app_context():
+        if not db.session.scalar(db.select(User.id).where(User.email.like(f"%@{SYNTHETIC_DOMAIN}")).limit(1)):
+            generate_fleet(args.documents, seed=1)
+        user_ids = db.session.scalars(db.select(User.id).where(User.email.like(f"%@{SYNTHETIC_DOMAIN}"))).all()
+        document_ids = db.session.scalars(db.select(Document.id)).all()
+
+    results = Results()
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=reader, args=(app, user_ids, deadline, results)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(app, document_ids, deadline, results, args.write_batch))
+                for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Postgres URL (default: scratch SQLite files).")
+    parser.add_argument("--profiles", default=None, help="Comma-separated profiles (default: all for the database).")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--write-batch", type=int, default=20, help="Reminder rows per write transaction.")
+    parser.add_argument("--documents", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tmp, "unused.db")
+    os.environ["OCR_EMBEDDED_WORKER"] = "false"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["SLOW_REQUEST_MS"] = "0"
+    from config import Config
+    Config.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    Config.OCR_CACHE_PATH = ""
+
+    from app_package.db_profiles import ENGINE_PROFILES
+    dialect = "postgresql" if args.database_url else "sqlite"
+    profiles = args.profiles.split(",") if args.profiles else [
+        name for name, profile in ENGINE_PROFILES.items() if profile["dialect"] in (None, dialect)
+    ]
+
+    print(f"{args.readers} readers + {args.writers} writers for {args.seconds:.0f}s per profile\n")
+    print(f"{'profile':<16}{'reads/s':>9}{'read p95':>10}{'writes/s':>10}{'write p95':>11}{'failed':>8}")
+    for profile in profiles:
+        url = args.database_url or "sqlite:///" + os.path.join(tmp, f"{profile}.db")
+        results = run_profile(profile, url, args)
+        reads, writes = results.latencies["read"], results.latencies["write"]
+        failed = results.errors["read"] + results.errors["write"]
+        print(f"{profile:<16}{len(reads) / args.seconds:>9.1f}{percentile(reads, 95) * 1000:>8.1f}ms"
+              f"{len(writes) / args.seconds:>10.1f}{percentile(writes, 95) * 1000:>9.1f}ms{failed:>8}")
+        if results.last_error:
+            print(f"    last error: {results.last_error[:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark: one SMTP connection per email vs. the pooled outbox sender.
+
+Starts a local stand-in SMTP server that accepts and discards mail, optionally
+adding a delay to each new connection to mimic a TLS handshake, then sends the
+same messages both ways and reports messages/second and connections opened.
+
+    python benchmarks/bench_outbox.py [--messages 500] [--connect-delay 0.05] [--batch-size 50]
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SinkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: every command succeeds, DATA is discarded."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.stats.lock:
+            server.stats.connections += 1
+        time.sleep(server.connect_delay)
+        self.reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.reply("250-sink")
+                self.reply("250 8BITMIME")
+            elif command == "DATA":
+                self.reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.stats.lock:
+                    server.stats.messages += 1
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay):
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.stats = SinkStats()
+        self.connect_delay = connect_delay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--connect-delay", type=float, default=0.05,
+                        help="Seconds the sink waits before greeting each connection.")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    sink = SmtpSink(args.connect_delay)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    os.environ["OCR_EMBEDDED_WORKER"] = "false"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    from config import Config
+    Config.MAIL_SERVER = "127.0.0.1"
+    Config.MAIL_PORT = sink.server_address[1]
+    Config.MAIL_USE_TLS = False
+    Config.MAIL_USERNAME = ""
+    Config.OCR_CACHE_PATH = ""
+
+    from flask_mail import Message
+    from sqlalchemy import insert
+    from app_package import create_app, db, mail
+    from app_package.mailer import deliver_outbox
+    from app_package.models import OutboxMessage
+
+    app = create_app()
+    body = "Hello,\n\nThe following vehicle documents need your attention:\n\n" + "- KA01AB1234 | Insurance\n" * 5
+
+    with app.app_context():
+        started = time.perf_counter()
+        for i in range(args.messages):
+            mail.send(Message(subject="Reminder", recipients=[f"user{i}@example.com"], body=body))
+        legacy_seconds = time.perf_counter() - started
+    legacy_connections = sink.stats.connections
+
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(insert(OutboxMessage), [
+            {"recipient": f"user{i}@example.com", "subject": "Reminder", "body": body, "status": "pending",
+             "attempts": 0, "next_attempt_at": now, "created_at": now}
+            for i in range(args.messages)
+        ])
+        db.session.commit()
+    stats = deliver_outbox(app, batch_size=args.batch_size, rate=0)
+    outbox_connections = sink.stats.connections - legacy_connections
+
+    print(f"{args.messages} messages, {args.connect_delay * 1000:.0f} ms connection setup")
+    print(f"{'sender':<12}{'seconds':>10}{'msg/s':>10}{'connections':>14}")
+    print(f"{'per-message':<12}{legacy_seconds:>10.2f}{args.messages / legacy_seconds:>10.1f}{legacy_connections:>14}")
+    print(f"{'outbox':<12}{stats['seconds']:>10.2f}{stats['sent'] / stats['seconds']:>10.1f}{outbox_connections:>14}")
+    print(f"speedup: {legacy_seconds / stats['seconds']:.1f}x, delivered {sink.stats.messages} messages")
+    sink.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,9 +13,92 @@ class Config:
     SQLALCHEMY_DATABASE_URI = _db_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Engine profile (app_package/db_profiles.py): "auto" picks "sqlite" (WAL, busy
+    # timeout) or "postgres" from the URL; "postgres-small" keeps each process to a
+    # few connections on small plans, "none" keeps SQLAlchemy's defaults
+    DB_PROFILE = os.environ.get("DB_PROFILE", "auto")
+    DB_POOL_SIZE = int(os.environ["DB_POOL_SIZE"]) if os.environ.get("DB_POOL_SIZE") else None
+    DB_MAX_OVERFLOW = int(os.environ["DB_MAX_OVERFLOW"]) if os.environ.get("DB_MAX_OVERFLOW") else None
+    # Optional read replica for the listing views and the reminder sweep's selection;
+    # a browser that wrote reads from the primary for REPLICA_STICKY_SECONDS after
+    REPLICA_DATABASE_URL = os.environ.get("REPLICA_DATABASE_URL", "")
+    REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+    # Fast worker startup: check the schema version instead of running create_all and
+    # migrations (run `flask db-upgrade` on deploy), and leave the scheduler to a
+    # separate `flask run-scheduler` process unless SCHEDULER_ENABLED says otherwise
+    FAST_STARTUP = os.environ.get("FAST_STARTUP", "false").lower() == "true"
+    # Log the startup phase timings of every process (also shown by `flask startup-report`)
+    STARTUP_REPORT = os.environ.get("STARTUP_REPORT", "false").lower() == "true"
+
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB
 
+    # File downloads: "" streams through the app, "x-accel" hands the transfer to nginx
+    # (an internal location at FILE_ACCEL_PREFIX aliased to UPLOAD_FOLDER), "x-sendfile"
+    # to Apache/lighttpd mod_xsendfile
+    FILE_SERVE_MODE = os.environ.get("FILE_SERVE_MODE", "").lower()
+    FILE_ACCEL_PREFIX = os.environ.get("FILE_ACCEL_PREFIX", "/protected-uploads/")
+    USE_X_SENDFILE = FILE_SERVE_MODE == "x-sendfile"
+    FILE_CACHE_MAX_AGE = 365 * 24 * 3600  # stored files are content-addressed, so never change
+
+    # Thumbnail cache under UPLOAD_FOLDER/thumbs, and the sizes rendered right after upload
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    THUMBNAIL_PREGENERATE = [s for s in os.environ.get("THUMBNAIL_PREGENERATE", "sm,lg").split(",") if s]
+
+    # Bulk ZIP upload: whole-archive size cap; each file in it is still held to MAX_CONTENT_LENGTH
+    BULK_UPLOAD_MAX_LENGTH = int(os.environ.get("BULK_UPLOAD_MAX_LENGTH", 200 * 1024 * 1024))
+    BULK_UPLOAD_MAX_FILES = int(os.environ.get("BULK_UPLOAD_MAX_FILES", 500))
+
+    # Background OCR queue
+    OCR_WORKER_PROCESSES = int(os.environ.get("OCR_WORKER_PROCESSES", 2))
+    OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", 8))
+    OCR_JOB_TIMEOUT = 600  # seconds before a "running" job is considered abandoned
+    OCR_MAX_ATTEMPTS = 3
+    # Drain the queue from the in-app scheduler; disable when running `flask ocr-worker`
+    OCR_EMBEDDED_WORKER = os.environ.get("OCR_EMBEDDED_WORKER", "true").lower() == "true"
+
+    # Persistent OCR result cache keyed on file content (empty path disables it)
+    OCR_CACHE_PATH = os.environ.get("OCR_CACHE_PATH", os.path.join(BASE_DIR, "ocr_cache.db"))
+    OCR_CACHE_MAX_ENTRIES = int(os.environ.get("OCR_CACHE_MAX_ENTRIES", 5000))
+
+    # Dashboard alert table: documents expiring within this many days (or already expired)
+    DASHBOARD_ALERT_WINDOW_DAYS = int(os.environ.get("DASHBOARD_ALERT_WINDOW_DAYS", 60))
+    DASHBOARD_ALERT_LIMIT = int(os.environ.get("DASHBOARD_ALERT_LIMIT", 100))
+
+    # Per-user page data cache: in-process LRU, or shared between workers with a
+    # redis:// URL (needs the redis package). Set CACHE_URL whenever more than one
+    # worker serves the app: a change only clears the in-process cache of the worker
+    # that made it, so the others serve stale data until the TTL runs out, which is
+    # why the TTLs default to 30 seconds without it
+    CACHE_URL = os.environ.get("CACHE_URL", "")
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+    # Dashboard data, and the logged-in user with their vehicles (read on every request)
+    DASHBOARD_CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", 600 if CACHE_URL else 30))  # 0 disables
+    IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", 300 if CACHE_URL else 30))  # 0 disables
+
+    DOCUMENTS_PAGE_SIZE = int(os.environ.get("DOCUMENTS_PAGE_SIZE", 50))
+    # Document export: rows fetched and sent per batch
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+    # Reminders fall due at Document.REMINDER_HOUR; the sweep picks them up this often
+    REMINDER_SWEEP_MINUTES = int(os.environ.get("REMINDER_SWEEP_MINUTES", 5))
+
+    # Run the in-app scheduler (reminders, outbox retries, OCR drain) in this process
+    SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "false" if FAST_STARTUP else "true").lower() == "true"
+
+    # Scheduler: split the reminder sweep into this many user-id ranges, each run
+    # under its own lock so several workers can sweep in parallel
+    SCHEDULER_SHARDS = int(os.environ.get("SCHEDULER_SHARDS", 1))
+    SCHEDULER_LOCK_TTL = 3600  # seconds before a crashed holder's lease can be taken over
+
+    # Instrumentation: Prometheus scrape endpoint (off by default; without METRICS_TOKEN
+    # anyone who can reach the app can read it) and a log of requests slower than
+    # SLOW_REQUEST_MS with their SQL (0 disables it)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 1000))
+
     # Flask-Mail
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
@@ -23,3 +106,11 @@ class Config:
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME", "")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD", "")
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER", "noreply@vehicletracker.com")
+
+    # Email outbox: messages per SMTP connection, send rate cap (0 = unlimited) and retry backoff
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_RATE_LIMIT = float(os.environ.get("OUTBOX_RATE_LIMIT", 10))  # messages per second
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+    OUTBOX_RETRY_BASE = 60  # seconds; doubled after every failed attempt
+    OUTBOX_RETRY_MAX = 6 * 3600
+    OUTBOX_SEND_TIMEOUT = 300  # seconds a claimed message is reserved for its sender
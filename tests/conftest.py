@@ -0,0 +1,69 @@
+"""Fixtures: an app on a throwaway SQLite database per test.
+
+    python -m pytest -q
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read by Config at import: no background threads or shared caches in tests
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["OCR_EMBEDDED_WORKER"] = "false"
+os.environ["OCR_CACHE_PATH"] = ""
+os.environ["DASHBOARD_CACHE_TTL"] = "0"
+os.environ["IDENTITY_CACHE_TTL"] = "0"
+
+import pytest
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite:///" + str(tmp_path / "test.db"))
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(Config, "MAIL_SUPPRESS_SEND", True, raising=False)
+    monkeypatch.setattr(Config, "TESTING", True, raising=False)
+    from app_package import create_app, db
+
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def make_fleet(app):
+    """Create users, each with vehicles and documents; returns the user ids."""
+    from app_package import db
+    from app_package.models import User, Vehicle, Document
+
+    created = []
+
+    def make(users=2, vehicles_per_user=2, expiries=(3,)):
+        """``expiries`` are days from today, one document per entry on each vehicle.
+
+        Calls can be repeated; users are numbered on from the previous call.
+        """
+        ids = []
+        with app.app_context():
+            for u in range(len(created), len(created) + users):
+                user = User(name=f"User {u}", email=f"user{u}@example.com")
+                user.set_password("secret1")
+                db.session.add(user)
+                for v in range(vehicles_per_user):
+                    vehicle = Vehicle(owner=user, registration_number=f"KA{u:02d}AB{v:04d}")
+                    db.session.add(vehicle)
+                    for days in expiries:
+                        expiry = None if days is None else date.today() + timedelta(days=days)
+                        db.session.add(Document(vehicle=vehicle, doc_type="insurance", expiry_date=expiry,
+                                                reminder_days=30))
+                db.session.flush()
+                ids.append(user.id)
+            db.session.commit()
+        created.extend(ids)
+        return ids
+    return make
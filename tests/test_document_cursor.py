@@ -0,0 +1,137 @@
+import html
+import re
+from datetime import date, timedelta
+from types import SimpleNamespace
+import pytest
+from itsdangerous import URLSafeSerializer
+from app_package import db
+from app_package.models import Document
+from app_package.routes.documents import decode_cursor, encode_cursor
+
+# Days from today; repeated values tie on expiry_date, None sorts last
+EXPIRIES = (5, None, 5, 1, 5, None, 10, 5, None)
+
+
+@pytest.fixture
+def client(app, make_fleet):
+    make_fleet(users=1, vehicles_per_user=1, expiries=EXPIRIES)
+    make_fleet(users=1, vehicles_per_user=1, expiries=(2, 3))  # another account's documents
+    app.config["DOCUMENTS_PAGE_SIZE"] = 2
+    client = app.test_client()
+    client.post("/auth/login", data={"email": "user0@example.com", "password": "secret1"})
+    return client
+
+
+def page_ids(response):
+    return [int(i) for i in re.findall(r'/documents/(\d+)/edit"', response.get_data(as_text=True))]
+
+
+def next_page_url(response):
+    match = re.search(r'href="([^"]*cursor=[^"]*)"', response.get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+def all_pages(client):
+    """Follow the next-page links from the first page; returns the ids in page order."""
+    seen, url = [], "/documents/"
+    for _ in range(len(EXPIRIES)):
+        response = client.get(url)
+        assert response.status_code == 200
+        ids = page_ids(response)
+        assert 0 < len(ids) <= 2
+        seen.extend(ids)
+        url = next_page_url(response)
+        if not url:
+            return seen
+    raise AssertionError("pagination did not terminate")
+
+
+def expected_order(app, vehicle_id):
+    with app.app_context():
+        docs = db.session.execute(
+            db.select(Document.id, Document.expiry_date).where(Document.vehicle_id == vehicle_id)
+        ).all()
+    # (expiry_date NULLS LAST, id)
+    return [doc_id for doc_id, _ in sorted(docs, key=lambda row: (row[1] is None, row[1] or date.min, row[0]))]
+
+
+def test_cursor_round_trip(app):
+    with app.test_request_context():
+        for expiry in (date(2027, 3, 12), None):
+            cursor = encode_cursor(SimpleNamespace(expiry_date=expiry, id=42))
+            assert decode_cursor(cursor) == (expiry, 42)
+
+
+def test_pages_cover_every_document_once_in_order(app, client):
+    seen = all_pages(client)
+
+    assert seen == expected_order(app, vehicle_id=1)
+    assert len(seen) == len(set(seen)) == len(EXPIRIES)
+
+
+def test_ties_on_expiry_date_are_split_by_id(app, client):
+    with app.app_context():
+        tied = db.session.execute(
+            db.select(Document.id).where(Document.expiry_date == date.today() + timedelta(days=5))
+            .order_by(Document.id)
+        ).scalars().all()
+    assert len(tied) == 4
+
+    # Page boundaries fall inside the run of equal dates
+    seen = all_pages(client)
+    assert [i for i in seen if i in tied] == tied
+
+
+def test_null_expiry_documents_come_last(app, client):
+    with app.app_context():
+        undated = set(db.session.execute(
+            db.select(Document.id).where(Document.expiry_date.is_(None))
+        ).scalars())
+
+    seen = all_pages(client)
+    assert set(seen[-len(undated):]) == undated
+    assert sorted(seen[-len(undated):]) == seen[-len(undated):]
+
+
+def test_cursor_after_null_expiry_continues_within_nulls(app, client):
+    with app.app_context():
+        first_undated = db.session.scalar(
+            db.select(db.func.min(Document.id)).where(Document.expiry_date.is_(None))
+        )
+    with app.test_request_context():
+        cursor = encode_cursor(SimpleNamespace(expiry_date=None, id=first_undated))
+    response = client.get("/documents/", query_string={"cursor": cursor})
+    with app.app_context():
+        undated = db.session.execute(
+            db.select(Document.id).where(Document.expiry_date.is_(None), Document.id > first_undated)
+            .order_by(Document.id)
+        ).scalars().all()
+    assert page_ids(response) == undated[:2]
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    "2027-03-12:5",  # the old unsigned format
+    "none:1",
+])
+def test_invalid_cursor_is_rejected(client, cursor):
+    assert client.get("/documents/", query_string={"cursor": cursor}).status_code == 400
+
+
+def test_tampered_cursor_is_rejected(app, client):
+    with app.test_request_context():
+        cursor = encode_cursor(SimpleNamespace(expiry_date=date(2027, 3, 12), id=3))
+    payload, signature = cursor.rsplit(".", 1)
+    forged = URLSafeSerializer("not-the-secret-key", salt="documents.cursor").dumps([None, 3])
+    tampered = payload[:-1] + ("A" if payload[-1] != "A" else "B") + "." + signature
+
+    assert client.get("/documents/", query_string={"cursor": tampered}).status_code == 400
+    assert client.get("/documents/", query_string={"cursor": forged}).status_code == 400
+    assert client.get("/documents/", query_string={"cursor": cursor}).status_code == 200
+
+
+def test_signed_cursor_with_bad_payload_is_rejected(app, client):
+    serializer = URLSafeSerializer(app.secret_key, salt="documents.cursor")
+    for value in (["2027-13-40", 1], ["2027-03-12", "1"], [None], "x"):
+        response = client.get("/documents/", query_string={"cursor": serializer.dumps(value)})
+        assert response.status_code == 400
@@ -0,0 +1,84 @@
+from datetime import datetime
+import pytest
+from app_package import db, scheduler
+from app_package.leader import job_lock
+from app_package.models import Document, OutboxMessage, ReminderLog
+
+
+@pytest.fixture(autouse=True)
+def no_delivery(monkeypatch):
+    """Leave queued emails in the outbox instead of sending them."""
+    monkeypatch.setattr(scheduler, "deliver_outbox", lambda app: None)
+
+
+def test_sweep_queues_one_email_per_user(app, make_fleet):
+    make_fleet(users=3, vehicles_per_user=2)
+
+    stats = scheduler.check_expiry_and_send_reminders(app)
+
+    assert stats["users"] == 3
+    assert stats["documents"] == 6
+    assert stats["emails_queued"] == 3
+    with app.app_context():
+        messages = db.session.execute(db.select(OutboxMessage)).scalars().all()
+        assert sorted(m.recipient for m in messages) == [f"user{u}@example.com" for u in range(3)]
+        assert all(m.status == "pending" for m in messages)
+        assert db.session.scalar(db.select(db.func.count(ReminderLog.id))) == 6
+
+
+def test_sweep_query_count_is_constant(app, make_fleet):
+    make_fleet(users=2, vehicles_per_user=1)
+    small = scheduler.check_expiry_and_send_reminders(app)
+
+    make_fleet(users=20, vehicles_per_user=5)
+    large = scheduler.check_expiry_and_send_reminders(app)
+
+    assert small["documents"] == 2
+    assert large["documents"] == 100
+    assert large["queries"] == small["queries"]
+
+
+def test_second_sweep_same_day_queues_nothing(app, make_fleet):
+    make_fleet(users=2)
+
+    first = scheduler.check_expiry_and_send_reminders(app)
+    second = scheduler.check_expiry_and_send_reminders(app)
+
+    assert first["emails_queued"] == 2
+    assert second["emails_queued"] == 0
+    assert second["documents"] == 0
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(OutboxMessage.id))) == 2
+        # Every swept document has moved on to tomorrow's reminder
+        due = db.session.scalar(
+            db.select(db.func.count(Document.id)).where(Document.next_reminder_at <= datetime.now())
+        )
+        assert due == 0
+
+
+def test_job_lock_refuses_second_holder_while_lease_is_live(app):
+    with app.app_context():
+        engine = db.engine
+
+    with job_lock(engine, "expiry_reminder:0/1", 60) as first:
+        assert first
+        with job_lock(engine, "expiry_reminder:0/1", 60) as second:
+            assert not second
+        # Other jobs have their own locks
+        with job_lock(engine, "outbox", 60) as other:
+            assert other
+
+    # Released when the first holder finished
+    with job_lock(engine, "expiry_reminder:0/1", 60) as again:
+        assert again
+
+
+def test_job_lock_takes_over_an_expired_lease(app):
+    with app.app_context():
+        engine = db.engine
+
+    with job_lock(engine, "expiry_reminder:0/1", -1) as crashed:
+        assert crashed
+        # The holder's lease has run out, as after a crash
+        with job_lock(engine, "expiry_reminder:0/1", 60) as successor:
+            assert successor